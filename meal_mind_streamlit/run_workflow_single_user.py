@@ -3,7 +3,7 @@ import os
 import logging
 import json
 from datetime import datetime
-from utils.meal_plan_workflow import MealPlanWorkflow, MealPlanGenerationState
+from utils.meal_plan_workflow import MealPlanWorkflow, MealPlanGenerationState, UserPlanState
 
 # Configure logging
 logging.basicConfig(
@@ -22,6 +22,10 @@ class SingleUserMealPlanWorkflow(MealPlanWorkflow):
         super().__init__()
         self.target_user_id = target_user_id
 
+    def has_due_users(self, target_date: str) -> bool:
+        # Always run for the target user, regardless of their schedule date
+        return True
+
     def agent_fetch_users(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
         """Fetch ONLY the specific user"""
         st.info(f"Fetching specific user: {self.target_user_id}")
@@ -45,7 +49,6 @@ class SingleUserMealPlanWorkflow(MealPlanWorkflow):
                 })
             
             state['users_to_process'] = users
-            state['current_user_index'] = 0
             
             if users:
                 st.success(f"Found user: {self.target_user_id}")
@@ -65,7 +68,7 @@ class SingleUserMealPlanWorkflow(MealPlanWorkflow):
         finally:
             cursor.close()
 
-    def agent_aggregate_user_data(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
+    def agent_aggregate_user_data(self, state: UserPlanState) -> UserPlanState:
         # Call parent method to do the work
         state = super().agent_aggregate_user_data(state)
         
@@ -86,7 +89,7 @@ class SingleUserMealPlanWorkflow(MealPlanWorkflow):
                 
         return state
 
-    def agent_generate_meal_plan(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
+    def agent_generate_meal_plan(self, state: UserPlanState) -> UserPlanState:
         # Call parent method
         state = super().agent_generate_meal_plan(state)
         
@@ -0,0 +1,87 @@
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain.schema import HumanMessage, AIMessage
+
+from utils.meal_router_agent import fast_plan, has_feedback_signal, request_cache_key
+
+
+def test_fast_plan():
+    today = "2025-12-08"
+
+    # Greetings go straight to general chat
+    assert fast_plan("Hello!", today) == [{"action": "general_chat", "params": {"query": "Hello!"}}]
+
+    # Simple meal lookups resolve the date without the LLM
+    assert fast_plan("What's for lunch?", today) == [
+        {"action": "meal_retrieval", "params": {"meal_type": "lunch", "date": "2025-12-08"}}
+    ]
+    assert fast_plan("show me my dinner tomorrow", today) == [
+        {"action": "meal_retrieval", "params": {"meal_type": "dinner", "date": "2025-12-09"}}
+    ]
+
+    # Snacks are stored as 'snacks', with or without the plural in the question
+    assert fast_plan("What's for snacks?", today) == [
+        {"action": "meal_retrieval", "params": {"meal_type": "snacks", "date": "2025-12-08"}}
+    ]
+    assert fast_plan("show me my snack tomorrow", today) == [
+        {"action": "meal_retrieval", "params": {"meal_type": "snacks", "date": "2025-12-09"}}
+    ]
+
+    # Calorie questions about a named food
+    assert fast_plan("How many calories in an avocado?", today) == [
+        {"action": "calorie_estimation", "params": {"query": "avocado"}}
+    ]
+
+    # Questions about the user's own meals go to the planner, not the calorie estimator
+    assert fast_plan("How many calories are in my lunch?", today) is None
+    assert fast_plan("calories in my dinner today", today) is None
+    assert fast_plan("How many calories in our breakfast?", today) is None
+    assert fast_plan("calories in tomorrow's snacks", today) is None
+    assert fast_plan("calories in a sandwich on Monday", today) is None
+
+    # Anything that needs history, confirmation or multiple steps uses the LLM planner
+    assert fast_plan("calories in it", today) is None
+    assert fast_plan("Add coffee to breakfast", today) is None
+    assert fast_plan("Yes, do it", today) is None
+    assert fast_plan("What's for lunch and dinner?", today) is None
+    assert fast_plan("hi, can you swap my lunch?", today) is None
+
+
+def test_feedback_signal():
+    # Preference statements go to the extractor
+    assert has_feedback_signal("I love salmon")
+    assert has_feedback_signal("Not a fan of mushrooms")
+    assert has_feedback_signal("I'm trying to reduce carbs")
+    assert has_feedback_signal("I don't eat pork, I'm allergic to nuts")
+
+    # Plain lookups and greetings do not
+    assert not has_feedback_signal("What's for lunch?")
+    assert not has_feedback_signal("How many calories in an avocado?")
+    assert not has_feedback_signal("Hello!")
+
+
+def test_request_cache_key():
+    today = "2025-12-08"
+    confirm = "Yes please go ahead with the change"
+    first = [HumanMessage(content="Swap my lunch for a salad"), AIMessage(content="Shall I replace the pasta?")]
+    second = [HumanMessage(content="Add coffee to breakfast"), AIMessage(content="Shall I add a black coffee?")]
+
+    # The same words after a different exchange must not share a cache entry
+    assert request_cache_key("u1", today, confirm, first) == request_cache_key("u1", today, "yes  please go ahead with the CHANGE", first)
+    assert request_cache_key("u1", today, confirm, first) != request_cache_key("u1", today, confirm, second)
+    assert request_cache_key("u1", today, confirm, first) != request_cache_key("u2", today, confirm, first)
+
+    # Short or pronoun-based inputs are never cached
+    assert request_cache_key("u1", today, "Yes, do it", first) is None
+    assert request_cache_key("u1", today, "How many calories are in that one", first) is None
+
+
+if __name__ == "__main__":
+    test_fast_plan()
+    test_feedback_signal()
+    test_request_cache_key()
+    print("Fast path tests passed")
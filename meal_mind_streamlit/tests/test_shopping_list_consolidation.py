@@ -0,0 +1,74 @@
+import sys
+import os
+import json
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.meal_plan_workflow import consolidate_shopping_list
+
+
+def test_consolidation():
+    shopping_list = {
+        "proteins": [
+            {"item": "Chicken Breast", "total_quantity_needed": 500, "quantity_to_purchase": 500, "unit": "g"},
+            {"item": "chicken breast", "total_quantity_needed": 1, "quantity_to_purchase": "1", "unit": "kg"},
+        ],
+        "vegetables": [
+            {"item": "Onions", "quantity_to_purchase": 2, "unit": "pieces"},
+            {"item": "Onion", "quantity_to_purchase": 1, "unit": "pieces"},
+            {"item": "Cilantro", "quantity_to_purchase": 1, "unit": "bunch"},
+            {"item": "Cilantro", "quantity_to_purchase": 20, "unit": "g"},
+            {"item": "Spinach", "quantity_to_purchase": "2 cups", "unit": "cups"},
+        ],
+        "grains": [
+            {"item": "Rice", "quantity_to_purchase": "1/2", "unit": "cups"},
+            {"item": "rice", "quantity_to_purchase": 1, "unit": "cups"},
+        ],
+        "fruits": [
+            {"item": "Apples", "quantity_to_purchase": 2, "unit": "pieces", "estimated_cost": 3.0},
+            {"item": "Apple", "quantity_to_purchase": 3, "unit": "pieces", "estimated_cost": 4.5, "notes": "Gala"},
+            {"item": "Banana", "quantity_to_purchase": 6, "unit": "pieces"},
+        ],
+        "total_estimated_cost": 42.5,
+        "total_items_to_purchase": 7,
+    }
+
+    result = consolidate_shopping_list(shopping_list)
+    print(f"\nConsolidated: {json.dumps(result, indent=2)}")
+
+    # g + kg are summed and expressed in the unit of the first entry
+    assert len(result["proteins"]) == 1
+    assert result["proteins"][0]["item"] == "Chicken Breast"
+    assert result["proteins"][0]["quantity_to_purchase"] == 1500
+    assert result["proteins"][0]["unit"] == "g"
+
+    # Plural/singular names merge; incompatible units ("bunch" vs "g") stay separate
+    names = [(i["item"], i["unit"], i["quantity_to_purchase"]) for i in result["vegetables"]]
+    assert ("Onions", "pieces", 3) in names
+    assert ("Cilantro", "bunch", 1) in names
+    assert ("Cilantro", "g", 20) in names
+
+    # Unparseable quantities are left as they were; merging keeps the first original value
+    assert ("Spinach", "cups", "2 cups") in names
+    assert ("Rice", "cups", "1/2") in [(i["item"], i["unit"], i["quantity_to_purchase"]) for i in result["grains"]]
+
+    # Costs are summed with the quantities; fields an item never had are not filled in
+    apples, banana = result["fruits"]
+    assert apples["quantity_to_purchase"] == 5
+    assert apples["estimated_cost"] == 7.5
+    assert apples["notes"] == "Gala"
+    assert "estimated_cost" not in banana and "notes" not in banana
+    assert banana == shopping_list["fruits"][2]
+    assert "total_quantity_needed" not in result["vegetables"][0]
+
+    # Non-list summary fields pass through untouched
+    assert result["total_estimated_cost"] == 42.5
+    assert result["total_items_to_purchase"] == 7
+
+    # Output must remain JSON serializable for persistence
+    json.dumps(result)
+
+
+if __name__ == "__main__":
+    test_consolidation()
@@ -269,7 +269,7 @@ class MealPlanAgentWithExtraction:
             Analyze and consolidate this shopping list to merge duplicate items and normalize units.
             
             CURRENT LIST:
-            {json.dumps(shopping_list, indent=2)}
+            {json.dumps(shopping_list, separators=(',', ':'))}
             
             INSTRUCTIONS:
             1. Merge items that are the same but named slightly differently (e.g., "Onions" vs "Onion", "2 medium" vs "40g").
@@ -50,6 +50,8 @@ class ChatAgent:
         except Exception as e:
             st.warning(f"Chat Agent initialization failed: {e}")
             self.chat_model = None
+        
+        self._app = None  # Compiled graph, built on first chat
 
     def _retrieve_context(self, query: str) -> str:
         """Retrieve relevant context using MCP"""
@@ -237,6 +239,12 @@ class ChatAgent:
         return END
 
     def build_graph(self):
+        """Return the compiled chat graph, building it once per agent"""
+        if self._app is None:
+            self._app = self._build_graph_uncached()
+        return self._app
+
+    def _build_graph_uncached(self):
         """Build the LangGraph workflow for chat"""
         workflow = StateGraph(ChatState)
         
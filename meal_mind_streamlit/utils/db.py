@@ -1,4 +1,6 @@
 import streamlit as st
+import json
+import pandas as pd
 import snowflake.connector
 from snowflake.snowpark import Session
 import os
@@ -255,7 +257,9 @@ def get_snowflake_connection():
             password=os.getenv('SNOWFLAKE_PASSWORD'),
             warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
             database=os.getenv('SNOWFLAKE_DATABASE'),
-            schema=os.getenv('SNOWFLAKE_SCHEMA')
+            schema=os.getenv('SNOWFLAKE_SCHEMA'),
+            # Shared by every page for the app's lifetime; don't let the session expire when idle
+            client_session_keep_alive=True
         )
         create_tables(conn)
         return conn
@@ -275,7 +279,8 @@ def get_snowpark_session():
             "warehouse": os.getenv('SNOWFLAKE_WAREHOUSE'),
             "database": os.getenv('SNOWFLAKE_DATABASE'),
             "schema": os.getenv('SNOWFLAKE_SCHEMA'),
-            "role": os.getenv('SNOWFLAKE_ROLE')
+            "role": os.getenv('SNOWFLAKE_ROLE'),
+            "client_session_keep_alive": True
         }
         session = Session.builder.configs(connection_params).create()
         return session
@@ -379,14 +384,17 @@ def get_latest_meal_plan(_conn, user_id):
         cursor.close()
 
 
-def get_meals_by_criteria(conn, user_id, day_number=None, meal_type=None, meal_date=None):
+def get_meals_by_criteria(conn, user_id, day_number=None, meal_type=None, meal_date=None, include_recipe=True):
     """Retrieve meals based on day and/or meal type from the latest active meal plan"""
     import json
     try:
         cursor = conn.cursor()
         
+        # The recipe is the largest column; callers that only list meals can skip it
+        recipe_column = "md.recipe" if include_recipe else "NULL AS recipe"
+        
         # Build dynamic query
-        query = """
+        query = f"""
             SELECT 
                 dm.day_number,
                 dm.day_name,
@@ -395,7 +403,7 @@ def get_meals_by_criteria(conn, user_id, day_number=None, meal_type=None, meal_d
                 md.meal_name,
                 md.ingredients_with_quantities,
                 md.nutrition,
-                md.recipe,
+                {recipe_column},
                 md.preparation_time,
                 md.cooking_time
             FROM daily_meals dm
@@ -830,6 +838,118 @@ def get_meal_plan_overview(_conn, user_id, specific_plan_id=None):
         cursor.close()
 
 
+@st.cache_data(ttl=300, show_spinner=False)
+def get_weekly_nutrition_history(_conn, user_id, num_weeks=4):
+    """Fetch nutrition data for the past N weeks"""
+    cursor = _conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT 
+                mp.start_date,
+                mp.end_date,
+                dm.meal_date,
+                dm.total_nutrition
+            FROM daily_meals dm
+            JOIN meal_plans mp ON dm.plan_id = mp.plan_id
+            WHERE dm.user_id = %s
+            AND dm.meal_date >= DATEADD(week, -%s, CURRENT_DATE())
+            ORDER BY dm.meal_date DESC
+        """, (user_id, num_weeks))
+        
+        rows = cursor.fetchall()
+        data = []
+        for row in rows:
+            nutrition = row[3]
+            if isinstance(nutrition, str):
+                try:
+                    nutrition = json.loads(nutrition)
+                except:
+                    nutrition = {}
+            elif nutrition is None:
+                nutrition = {}
+            
+            data.append({
+                'date': row[2],
+                'calories': nutrition.get('calories', 0),
+                'protein': nutrition.get('protein_g', 0),
+                'carbs': nutrition.get('carbohydrates_g', 0),
+                'fat': nutrition.get('fat_g', 0),
+                'fiber': nutrition.get('fiber_g', 0)
+            })
+        
+        return pd.DataFrame(data)
+    except Exception as e:
+        return pd.DataFrame()
+    finally:
+        cursor.close()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_weekly_averages(_conn, user_id):
+    """Get average nutrition per week for comparison"""
+    cursor = _conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT 
+                DATE_TRUNC('week', dm.meal_date) as week_start,
+                AVG(PARSE_JSON(dm.total_nutrition):calories::FLOAT) as avg_calories,
+                AVG(PARSE_JSON(dm.total_nutrition):protein_g::FLOAT) as avg_protein,
+                AVG(PARSE_JSON(dm.total_nutrition):carbohydrates_g::FLOAT) as avg_carbs,
+                AVG(PARSE_JSON(dm.total_nutrition):fat_g::FLOAT) as avg_fat,
+                AVG(PARSE_JSON(dm.total_nutrition):fiber_g::FLOAT) as avg_fiber
+            FROM daily_meals dm
+            JOIN meal_plans mp ON dm.plan_id = mp.plan_id
+            WHERE dm.user_id = %s
+            AND dm.meal_date >= DATEADD(week, -4, CURRENT_DATE())
+            GROUP BY DATE_TRUNC('week', dm.meal_date)
+            ORDER BY week_start DESC
+            LIMIT 4
+        """, (user_id,))
+        
+        rows = cursor.fetchall()
+        data = []
+        for row in rows:
+            data.append({
+                'week': row[0].strftime('%b %d') if row[0] else 'Unknown',
+                'calories': float(row[1] or 0),
+                'protein': float(row[2] or 0),
+                'carbs': float(row[3] or 0),
+                'fat': float(row[4] or 0),
+                'fiber': float(row[5] or 0)
+            })
+        
+        return pd.DataFrame(data)
+    except Exception as e:
+        return pd.DataFrame()
+    finally:
+        cursor.close()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_plan_count(_conn, user_id):
+    """Count the user's active and completed meal plans"""
+    cursor = _conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT COUNT(DISTINCT mp.plan_id) 
+            FROM meal_plans mp
+            WHERE mp.user_id = %s
+            AND mp.status IN ('ACTIVE', 'COMPLETED')
+        """, (user_id,))
+        return cursor.fetchone()[0]
+    except:
+        return 0
+    finally:
+        cursor.close()
+
+
+def clear_dashboard_caches():
+    """Drop cached analytics so the next render sees meal plan changes"""
+    get_weekly_nutrition_history.clear()
+    get_weekly_averages.clear()
+    get_plan_count.clear()
+
+
 @st.cache_data(ttl=60)
 def get_meal_plan_history(_conn, user_id, limit=5):
     """Fetch recent meal plans for history selection"""
@@ -861,6 +981,39 @@ def get_meal_plan_history(_conn, user_id, limit=5):
         cursor.close()
 
 
+@st.cache_data(ttl=60)
+def get_shopping_list_history(_conn, user_id, limit=5):
+    """Fetch recent meal plans with their latest shopping list in one query"""
+    try:
+        cursor = _conn.cursor()
+        cursor.execute("""
+            SELECT p.plan_id, p.plan_name, p.start_date, p.end_date, p.status, s.shopping_data
+            FROM meal_plans p
+            LEFT JOIN shopping_lists s ON s.plan_id = p.plan_id AND s.user_id = p.user_id
+            WHERE p.user_id = %s
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY p.plan_id ORDER BY s.created_at DESC) = 1
+            ORDER BY p.created_at DESC
+            LIMIT %s
+        """, (user_id, limit))
+        
+        plans = []
+        for row in cursor.fetchall():
+            plans.append({
+                "plan_id": row[0],
+                "plan_name": row[1],
+                "start_date": row[2],
+                "end_date": row[3],
+                "status": row[4],
+                "shopping_data": row[5]
+            })
+        return plans
+    except Exception as e:
+        st.error(f"Error fetching shopping lists: {e}")
+        return []
+    finally:
+        cursor.close()
+
+
 def get_future_meal_plan(_conn, user_id):
     """Check if a future meal plan exists"""
     try:
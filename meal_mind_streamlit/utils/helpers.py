@@ -4,22 +4,29 @@ import uuid
 import pandas as pd
 from datetime import datetime, timedelta
 from utils.agent import MealPlanAgentWithExtraction, MealPlanState
-from utils.db import get_snowpark_session
+from utils.db import get_snowpark_session, get_user_inventory, get_latest_meal_plan, get_meal_plan_history, get_shopping_list_history, clear_dashboard_caches
 
 def generate_comprehensive_meal_plan_prompt(user_profile, inventory_df, start_day=1, num_days=7, previous_plan_context=None, start_date_obj=None):
-    """Generate comprehensive prompt for the agent"""
-
-    inventory_by_category = {}
-    if not inventory_df.empty:
-        for _, item in inventory_df.iterrows():
-            category = item['category'] or 'Other'
-            if category not in inventory_by_category:
-                inventory_by_category[category] = []
-            inventory_by_category[category].append({
-                'item': item['item_name'],
-                'quantity': item['quantity'],
-                'unit': item['unit']
-            })
+    """Generate comprehensive prompt for the agent
+
+    inventory_df can also be an already categorized {category: [items]} dict,
+    which skips the DataFrame regrouping below.
+    """
+
+    if isinstance(inventory_df, dict):
+        inventory_by_category = inventory_df
+    else:
+        inventory_by_category = {}
+        if not inventory_df.empty:
+            for item in inventory_df.to_dict('records'):
+                category = item['category'] or 'Other'
+                if category not in inventory_by_category:
+                    inventory_by_category[category] = []
+                inventory_by_category[category].append({
+                    'item': item['item_name'],
+                    'quantity': item['quantity'],
+                    'unit': item['unit']
+                })
 
     # Calculate dates for the prompt
     base_date = start_date_obj if start_date_obj else datetime.now().date()
@@ -63,7 +70,7 @@ DAILY NUTRITIONAL TARGETS:
 - Fiber: {user_profile['daily_fiber']:.1f}g
 
 CURRENT INVENTORY:
-{json.dumps(inventory_by_category, indent=2)}
+{json.dumps(inventory_by_category, separators=(',', ':'))}
 
 Create a detailed meal plan for these {num_days} days with complete recipes and inventory optimization.
 Generate plans based ONLY on available inventory where possible.
@@ -246,6 +253,18 @@ def get_inventory_items(_conn, user_id):
     return pd.DataFrame()
 
 
+def invalidate_user_context():
+    """Drop cached inventory/meal plan reads and the chat context after a write"""
+    get_inventory_items.clear()
+    get_user_inventory.clear()
+    get_latest_meal_plan.clear()
+    get_meal_plan_history.clear()
+    get_shopping_list_history.clear()
+    clear_dashboard_caches()
+    # The chat view rebuilds its context on the next turn
+    st.session_state.pop("chat_context_cache", None)
+
+
 def add_inventory_item(conn, user_id, item_name, quantity, unit, category=None, notes=None):
     """Add inventory item"""
     cursor = conn.cursor()
@@ -258,6 +277,31 @@ def add_inventory_item(conn, user_id, item_name, quantity, unit, category=None,
                        """, (inventory_id, user_id, item_name, quantity, unit, category, notes))
         conn.commit()
         cursor.close()
+        invalidate_user_context()
+        return True
+    except:
+        cursor.close()
+        return False
+
+
+def add_inventory_items(conn, user_id, items):
+    """Add several inventory items in one round trip; items are (item_name, quantity, unit, category) tuples"""
+    if not items:
+        return True
+    cursor = conn.cursor()
+    rows = [
+        (str(uuid.uuid4()), user_id, item_name, quantity, unit, category, None)
+        for item_name, quantity, unit, category in items
+    ]
+
+    try:
+        cursor.executemany("""
+                       INSERT INTO inventory (inventory_id, user_id, item_name, quantity, unit, category, notes)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s)
+                       """, rows)
+        conn.commit()
+        cursor.close()
+        invalidate_user_context()
         return True
     except:
         cursor.close()
@@ -271,6 +315,7 @@ def delete_inventory_item(conn, inventory_id):
         cursor.execute("DELETE FROM inventory WHERE inventory_id = %s", (inventory_id,))
         conn.commit()
         cursor.close()
+        invalidate_user_context()
         return True
     except:
         cursor.close()
@@ -295,6 +340,7 @@ def update_plan_suggestions(conn, plan_id, suggestions):
                            WHERE plan_id = %s
                            """, (json.dumps(summary), plan_id))
             conn.commit()
+            invalidate_user_context()
             return True
     except Exception as e:
         st.error(f"Error updating suggestions: {e}")
@@ -402,6 +448,7 @@ def generate_new_meal_plan(conn, user_id):
 
                 if plan_id:
                     conn.commit()
+                    invalidate_user_context()
                     st.success("✅ Your meal plan has been generated!")
                     st.rerun()
                 else:
@@ -20,9 +20,14 @@ from utils.db import (
 class MealAdjustmentAgent:
     """Agent for handling meal changes, replacements, and restaurant entries"""
 
-    def __init__(self, session, conn):
+    def __init__(self, session, conn, chat_model=None, mcp_client=None):
         self.session = session
         self.conn = conn
+        if chat_model is not None:
+            # Reuse the caller's Cortex client and MCP client instead of creating new ones
+            self.llm = chat_model
+            self.mcp_client = mcp_client
+            return
         try:
             # Initialize Cortex LLM
             # NOTE: We are now using manual MCP retrieval, so we remove cortex_search_service
@@ -131,7 +136,7 @@ class MealAdjustmentAgent:
             return {"status": "error", "message": f"No {meal_type} found for this date."}
             
         current_meal = get_meal_detail_by_id(self.conn, detail_id)
-        current_meal_context = json.dumps(current_meal, indent=2) if current_meal else "No existing meal data."
+        current_meal_context = json.dumps(current_meal, separators=(',', ':')) if current_meal else "No existing meal data."
 
         # 2. Retrieve Relevant Food Data via MCP
         print(f"DEBUG: Retrieving context for adjustment: {user_input}")
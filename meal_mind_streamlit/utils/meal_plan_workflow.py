@@ -4,10 +4,13 @@ Handles automated weekly meal plan generation with intelligent retry logic
 """
 import sys
 import os
-from typing import TypedDict, Dict, List, Optional, Any
+import operator
+import threading
+from typing import TypedDict, Annotated, Dict, List, Optional, Any
 from datetime import datetime, timedelta
+from collections import defaultdict
 from langgraph.graph import StateGraph, END
-import json
+from langgraph.types import Send
 import pandas as pd
 
 # Add project root to path (dynamically finds the parent directory of 'utils')
@@ -21,6 +24,62 @@ from utils.agent import MealPlanAgentWithExtraction
 from utils.feedback_agent import FeedbackAgent
 
 
+# ==================== SQL STATEMENTS ====================
+CURSOR_ARRAYSIZE = 1000
+
+# Kept at module level so every run sends byte-identical statement text
+SQL_FETCH_USERS = """
+    SELECT DISTINCT user_id, next_plan_date, schedule_id
+    FROM planning_schedule
+    WHERE next_plan_date <= %s
+    AND status = 'ACTIVE'
+    ORDER BY user_id
+"""
+
+SQL_COUNT_DUE_USERS = """
+    SELECT COUNT(*)
+    FROM planning_schedule
+    WHERE next_plan_date <= %s
+    AND status = 'ACTIVE'
+"""
+
+SQL_GET_PROFILE = """
+    SELECT username, age, gender, height_cm, weight_kg,
+           health_goal, dietary_restrictions, food_allergies,
+           daily_calories, daily_protein, daily_carbohydrate, daily_fat, daily_fiber,
+           preferred_cuisines, bmi, activity_level
+    FROM users
+    WHERE user_id = %s
+"""
+
+SQL_GET_INVENTORY = """
+    SELECT item_name, quantity, unit, category
+    FROM inventory
+    WHERE user_id = %s AND quantity > 0
+"""
+
+PREVIOUS_MEALS_LIMIT = 28
+
+SQL_GET_PREVIOUS_MEALS = f"""
+    SELECT md.meal_type, md.meal_name
+    FROM meal_details md
+    JOIN daily_meals dm ON md.meal_id = dm.meal_id
+    JOIN meal_plans mp ON dm.plan_id = mp.plan_id
+    WHERE mp.user_id = %s
+    AND mp.status = 'ACTIVE'
+    ORDER BY mp.created_at DESC
+    LIMIT {PREVIOUS_MEALS_LIMIT}
+"""
+
+# Deactivates the user's OTHER schedules and advances next_plan_date on the current one
+SQL_UPDATE_SCHEDULE = """
+    UPDATE planning_schedule
+    SET status = CASE WHEN schedule_id = %s THEN status ELSE 'INACTIVE' END,
+        next_plan_date = CASE WHEN schedule_id = %s THEN %s ELSE next_plan_date END
+    WHERE user_id = %s
+"""
+
+
 # ==================== HELPER FUNCTION ====================
 def fix_day_names_with_start_date(meal_plan_data: Dict[str, Any], start_date) -> Dict[str, Any]:
     """Fix day names in meal plan to match actual dates starting from start_date"""
@@ -45,12 +104,114 @@ def fix_day_names_with_start_date(meal_plan_data: Dict[str, Any], start_date) ->
         return meal_plan_data
 
 
+# Units that can be converted to a common base unit before summing.
+# Anything not listed here (e.g. "bunch", "pieces") only merges with the exact same unit.
+UNIT_CONVERSIONS = {
+    'g': ('g', 1.0), 'gram': ('g', 1.0), 'grams': ('g', 1.0),
+    'kg': ('g', 1000.0), 'mg': ('g', 0.001),
+    'lb': ('g', 453.6), 'lbs': ('g', 453.6), 'oz': ('g', 28.35),
+    'ml': ('ml', 1.0), 'l': ('ml', 1000.0), 'liter': ('ml', 1000.0), 'liters': ('ml', 1000.0),
+}
+
+SHOPPING_QUANTITY_FIELDS = ('quantity_to_purchase', 'total_quantity_needed', 'quantity_in_inventory')
+
+# Per-item money fields; summed when duplicates merge, never unit-converted
+SHOPPING_COST_FIELDS = ('estimated_cost',)
+
+
+def canonical_item_name(name: str) -> str:
+    """Normalize an item name for duplicate detection ("Onions " -> "onion")"""
+    key = ' '.join(str(name).lower().split())
+    if len(key) > 3 and key.endswith('s') and not key.endswith('ss'):
+        key = key[:-1]
+    return key
+
+
+SHOPPING_TOTAL_FIELDS = ('total_estimated_cost', 'total_items_from_inventory', 'total_items_to_purchase')
+
+
+def add_shopping_numbers(first: Any, second: Any) -> Optional[float]:
+    """Sum two shopping list numbers, or None when either isn't a plain number (e.g. "2 cups")"""
+    values = pd.to_numeric(pd.Series([first, second], dtype=object), errors='coerce')
+    return None if values.isna().any() else float(values.sum())
+
+
+def consolidate_shopping_list(shopping_list: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge duplicate shopping list items per category and sum compatible quantities"""
+    consolidated = dict(shopping_list)
+    for category, items in shopping_list.items():
+        if not isinstance(items, list) or not items:
+            continue
+
+        named = [item for item in items if isinstance(item, dict) and item.get('item')]
+        unnamed = [item for item in items if not (isinstance(item, dict) and item.get('item'))]
+        if not named:
+            continue
+
+        df = pd.DataFrame.from_records(named)
+        if 'unit' not in df:
+            df['unit'] = ''
+        df['unit'] = df['unit'].fillna('').astype(str)
+
+        conversions = df['unit'].str.strip().str.lower().map(lambda u: UNIT_CONVERSIONS.get(u, (u, 1.0)))
+        df['_base_unit'] = conversions.str[0]
+        df['_factor'] = conversions.str[1]
+        df['_key'] = df['item'].map(canonical_item_name)
+
+        # Sums use parsed copies of the quantities; an item is only rewritten when duplicates
+        # merge, and a field keeps its original value if any duplicate's can't be parsed
+        fields = [col for col in df.columns if not col.startswith('_')]
+        quantity_fields = [f for f in SHOPPING_QUANTITY_FIELDS if f in df]
+        cost_fields = [f for f in SHOPPING_COST_FIELDS if f in df]
+        summed = quantity_fields + cost_fields
+        for field in summed:
+            parsed = pd.to_numeric(df[field], errors='coerce')
+            df[f'_bad_{field}'] = df[field].notna() & parsed.isna()
+            df[f'_num_{field}'] = parsed * df['_factor'] if field in quantity_fields else parsed
+        df['_row'] = range(len(df))
+
+        grouped = df.groupby(['_key', '_base_unit'], sort=False)
+        firsts = grouped[fields + ['_factor', '_row']].first()
+        sizes = grouped.size()
+        # min_count=1 keeps a field missing when no duplicate had it
+        sums = grouped[[f'_num_{f}' for f in summed]].sum(min_count=1)
+        unparseable = grouped[[f'_bad_{f}' for f in summed]].any()
+
+        records = []
+        for key, first in firsts.to_dict('index').items():
+            if sizes[key] == 1:
+                records.append(named[int(first['_row'])])
+                continue
+            record = {field: first[field] for field in fields}
+            for field in summed:
+                total = sums.at[key, f'_num_{field}']
+                if unparseable.at[key, f'_bad_{field}'] or pd.isna(total):
+                    continue
+                # Express summed quantities in the unit of the first occurrence
+                if field in quantity_fields:
+                    total = total / first['_factor']
+                record[field] = round(float(total), 2)
+            records.append({k: v for k, v in record.items() if not (v is None or (isinstance(v, float) and v != v))})
+
+        consolidated[category] = records + unnamed
+
+    return consolidated
+
+
 # ==================== STATE DEFINITION ====================
 class MealPlanGenerationState(TypedDict):
     """State tracking for meal plan generation workflow"""
     current_date: str
     users_to_process: List[Dict]
-    current_user_index: int
+    # Per-user subgraph results are summed/concatenated across the fan-out
+    success_count: Annotated[int, operator.add]
+    failure_count: Annotated[int, operator.add]
+    errors: Annotated[List[Dict], operator.add]
+
+
+class UserPlanState(TypedDict):
+    """State for one user's aggregate -> generate -> consolidate -> persist pipeline"""
+    current_date: str
     current_user: Optional[Dict]
     user_data: Optional[Dict]  # Profile, feedback, preferences
     generated_plan: Optional[Dict]
@@ -68,22 +229,53 @@ class MealPlanWorkflow:
         self.conn = get_snowflake_connection()
         self.session = get_snowpark_session()
         self.max_retries = 3
+        self.max_concurrency = 4  # Users processed in parallel
+        self._cursors = {}
+        self._cursor_lock = threading.Lock()
+        self._meal_agent = None
+    
+    @property
+    def meal_agent(self) -> MealPlanAgentWithExtraction:
+        """LLM agent wrapper, created on first use and reused across users and retries"""
+        if self._meal_agent is None:
+            self._meal_agent = MealPlanAgentWithExtraction(self.session)
+        return self._meal_agent
+    
+    # ==================== CURSOR MANAGEMENT ====================
+    def _get_cursor(self, user_id: str = None):
+        """Cursor shared by all agents while processing one user (users run in parallel)"""
+        with self._cursor_lock:
+            cursor = self._cursors.get(user_id)
+            if cursor is None:
+                cursor = self._cursors[user_id] = self.conn.cursor()
+        # Fetch rows in large batches (connector default is 1)
+        cursor.arraysize = CURSOR_ARRAYSIZE
+        return cursor
+
+    def _release_cursor(self, user_id: str = None):
+        """Close a user's cursor once their pipeline has finished"""
+        with self._cursor_lock:
+            cursor = self._cursors.pop(user_id, None)
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception as e:
+                print(f"Could not close cursor: {e}")
+
+    def _release_all_cursors(self):
+        """Close any cursors left open (called at workflow end)"""
+        for user_id in list(self._cursors):
+            self._release_cursor(user_id)
     
     # ==================== AGENT 1: USER FETCHER ====================
     def agent_fetch_users(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
         """Fetch all users needing meal plans today"""
         print(f"[AGENT 1] Fetching users needing plans for {state['current_date']}")
         
-        cursor = self.conn.cursor()
+        cursor = self._get_cursor()
         try:
             # Removed username from query as it's not in planning_schedule
-            cursor.execute("""
-                SELECT DISTINCT user_id, next_plan_date, schedule_id
-                FROM planning_schedule
-                WHERE next_plan_date <= %s
-                AND status = 'ACTIVE'
-                ORDER BY user_id
-            """, (state['current_date'],))
+            cursor.execute(SQL_FETCH_USERS, (state['current_date'],))
             
             users = []
             seen_users = set()
@@ -97,7 +289,6 @@ class MealPlanWorkflow:
                     seen_users.add(row[0])
             
             state['users_to_process'] = users
-            state['current_user_index'] = 0
             
             print(f"[AGENT 1] Found {len(users)} users to process")
             return state
@@ -110,31 +301,22 @@ class MealPlanWorkflow:
                 'timestamp': datetime.now().isoformat()
             })
             return state
-        finally:
-            cursor.close()
     
     # ==================== AGENT 2: DATA AGGREGATOR ====================
-    def agent_aggregate_user_data(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
+    def agent_aggregate_user_data(self, state: UserPlanState) -> UserPlanState:
         """Gather all user data: profile, preferences, feedback, inventory"""
-        if not state['users_to_process'] or state['current_user_index'] >= len(state['users_to_process']):
+        user = state.get('current_user')
+        if not user:
             return state
         
-        user = state['users_to_process'][state['current_user_index']]
         user_id = user['user_id']
         
         print(f"[AGENT 2] Aggregating data for user {user_id}")
         
-        cursor = self.conn.cursor()
+        cursor = self._get_cursor(user_id)
         try:
             # Get user profile
-            cursor.execute("""
-                SELECT username, age, gender, height_cm, weight_kg, 
-                       health_goal, dietary_restrictions, food_allergies,
-                       daily_calories, daily_protein, daily_carbohydrate, daily_fat, daily_fiber,
-                       preferred_cuisines, bmi, activity_level
-                FROM users
-                WHERE user_id = %s
-            """, (user_id,))
+            cursor.execute(SQL_GET_PROFILE, (user_id,))
             
             profile_row = cursor.fetchone()
             if not profile_row:
@@ -161,49 +343,24 @@ class MealPlanWorkflow:
             }
             
             # Get inventory
-            cursor.execute("""
-                SELECT item_name, quantity, unit, category
-                FROM inventory
-                WHERE user_id = %s AND quantity > 0
-            """, (user_id,))
-            
-            inventory_by_category = {}
-            inventory_list = []
-            for row in cursor.fetchall():
-                category = row[3] or 'Other'
-                if category not in inventory_by_category:
-                    inventory_by_category[category] = []
-                
-                item_data = {
+            cursor.execute(SQL_GET_INVENTORY, (user_id,))
+            
+            inventory_by_category = defaultdict(list)
+            for row in cursor:
+                inventory_by_category[row[3] or 'Other'].append({
                     'item': row[0],
                     'quantity': row[1],
                     'unit': row[2]
-                }
-                inventory_by_category[category].append(item_data)
-                
-                # Also store flat list for DataFrame
-                inventory_list.append({
-                    'item_name': row[0],
-                    'quantity': row[1],
-                    'unit': row[2],
-                    'category': category
                 })
             
             # Get previous week's meals for variety
-            cursor.execute("""
-                SELECT md.meal_type, md.meal_name
-                FROM meal_details md
-                JOIN daily_meals dm ON md.meal_id = dm.meal_id
-                JOIN meal_plans mp ON dm.plan_id = mp.plan_id
-                WHERE mp.user_id = %s
-                AND mp.status = 'ACTIVE'
-                ORDER BY mp.created_at DESC
-                LIMIT 28
-            """, (user_id,))
-            
-            previous_meals = []
-            for row in cursor.fetchall():
-                previous_meals.append(f"{row[0].title()}: {row[1]}")
+            cursor.arraysize = PREVIOUS_MEALS_LIMIT
+            cursor.execute(SQL_GET_PREVIOUS_MEALS, (user_id,))
+            
+            previous_meals = [
+                f"{row[0].title()}: {row[1]}"
+                for row in cursor.fetchmany(PREVIOUS_MEALS_LIMIT)
+            ]
             
             # Get user preferences (learned from feedback)
             feedback_agent = FeedbackAgent(self.conn, self.session)
@@ -220,15 +377,12 @@ class MealPlanWorkflow:
                 'user_id': user_id,
                 'profile': profile,
                 'preferences': preferences,
-                'inventory': inventory_by_category,
+                'inventory': dict(inventory_by_category),
                 'previous_meals': previous_meals
             }
             
             print(f"[AGENT 2] Aggregated data for {user_id}: {len(inventory_by_category)} inventory categories, {len(preferences.get('likes', []))} likes, {len(previous_meals)} previous meals")
             
-            # Store raw inventory for DataFrame creation
-            state['user_data']['inventory_list'] = inventory_list
-            
             print(f"[AGENT 2] Data aggregation complete for {user_id}")
             return state
             
@@ -243,23 +397,22 @@ class MealPlanWorkflow:
             return state
 
     # ==================== AGENT 3: MEAL PLAN GENERATOR ====================
-    def agent_generate_meal_plan(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
+    def agent_generate_meal_plan(self, state: UserPlanState) -> UserPlanState:
         """Generate meal plan using batched generation (Days 1-4, then 5-7)"""
         if not state['user_data']:
             return state
             
         user_id = state['user_data']['user_id']
         profile = state['user_data']['profile']
-        inventory_list = state['user_data'].get('inventory_list', [])
+        inventory = state['user_data'].get('inventory', {})
         
         print(f"[AGENT 3] Generating meal plan for {user_id}")
         
         try:
-            # Initialize agent
-            agent = MealPlanAgentWithExtraction(self.session)
+            agent = self.meal_agent
             
-            # Create DataFrame from inventory list
-            inventory_df = pd.DataFrame(inventory_list)
+            # The prompt generator accepts the categorized inventory directly (no DataFrame needed)
+            total_inventory_count = sum(len(items) for items in inventory.values())
             
             from utils.helpers import generate_comprehensive_meal_plan_prompt
             
@@ -274,7 +427,7 @@ class MealPlanWorkflow:
                 if not start_date_obj:
                     start_date_obj = datetime.now().date()
                 
-                prompt_1 = generate_comprehensive_meal_plan_prompt(profile, inventory_df, start_day=1, num_days=4, start_date_obj=start_date_obj)
+                prompt_1 = generate_comprehensive_meal_plan_prompt(profile, inventory, start_day=1, num_days=4, start_date_obj=start_date_obj)
                 response_1 = agent.agent.invoke({"input": prompt_1})
                 raw_1 = agent.process_agent_response(response_1)
                 data_1 = agent.extract_json_from_response(raw_1)
@@ -300,7 +453,7 @@ class MealPlanWorkflow:
                 print(f"[AGENT 3] Generating Batch 2 for {user_id}...")
                 prompt_2 = generate_comprehensive_meal_plan_prompt(
                     profile, 
-                    inventory_df, 
+                    inventory, 
                     start_day=5, 
                     num_days=3, 
                     previous_plan_context=context_str,
@@ -312,58 +465,37 @@ class MealPlanWorkflow:
                 
                 # Merge Results
                 if data_1 and data_2:
-                    merged_plan = data_1
-                    
-                    # Ensure structure exists in batch 2
-                    days_2 = data_2.get('meal_plan', {}).get('days', [])
-                    
-                    # Append days from batch 2 to batch 1
-                    if 'meal_plan' in merged_plan and 'days' in merged_plan['meal_plan']:
-                        merged_plan['meal_plan']['days'].extend(days_2)
+                    # Build a new plan rather than mutating data_1 in place
+                    plan_1 = data_1.get('meal_plan', {})
+                    merged_plan = {
+                        **data_1,
+                        'meal_plan': {
+                            **plan_1,
+                            'days': [*plan_1.get('days', []), *data_2.get('meal_plan', {}).get('days', [])],
+                            'week_summary': dict(plan_1.get('week_summary', {}))
+                        },
+                        'recommendations': dict(data_1.get('recommendations', {}))
+                    }
                         
                     # Merge shopping lists with quantity summation
                     try:
-                        sl_1 = merged_plan.get('recommendations', {}).get('shopping_list_summary', {})
+                        sl_1 = merged_plan['recommendations'].get('shopping_list_summary', {})
                         sl_2 = data_2.get('recommendations', {}).get('shopping_list_summary', {})
                         
                         if sl_1 and sl_2:
-                            for category in ['proteins', 'produce', 'pantry', 'grains', 'vegetables', 'fruits', 'dairy_alternatives']:
-                                if category in sl_2:
-                                    if category not in sl_1:
-                                        sl_1[category] = []
-                                    
-                                    # Create a map of existing items for easy lookup
-                                    existing_items = {item['item'].lower(): item for item in sl_1[category] if 'item' in item}
-                                    
-                                    for new_item in sl_2[category]:
-                                        if 'item' not in new_item:
-                                            continue
-                                            
-                                        name = new_item['item'].lower()
-                                        if name in existing_items:
-                                            # Update quantity if units match (simple check)
-                                            existing = existing_items[name]
-                                            # Try to sum quantities if they are numbers
-                                            try:
-                                                q1 = float(existing.get('quantity_to_purchase', 0))
-                                                q2 = float(new_item.get('quantity_to_purchase', 0))
-                                                existing['quantity_to_purchase'] = q1 + q2
-                                                
-                                                # Also sum total needed
-                                                t1 = float(existing.get('total_quantity_needed', 0))
-                                                t2 = float(new_item.get('total_quantity_needed', 0))
-                                                existing['total_quantity_needed'] = t1 + t2
-                                            except:
-                                                pass # Keep original if parsing fails
-                                        else:
-                                            # Add new item
-                                            sl_1[category].append(new_item)
-                                            existing_items[name] = new_item
+                            # Join each category across batches and merge duplicates unit-aware
+                            joined = dict(sl_1)
+                            for category, items in sl_2.items():
+                                if isinstance(items, list):
+                                    joined[category] = [*(sl_1.get(category) or []), *items]
+                            sl_1 = consolidate_shopping_list(joined)
+                            merged_plan['recommendations']['shopping_list_summary'] = sl_1
                             
-                            # Sum totals
-                            sl_1['total_estimated_cost'] = float(sl_1.get('total_estimated_cost', 0)) + float(sl_2.get('total_estimated_cost', 0))
-                            sl_1['total_items_from_inventory'] = int(sl_1.get('total_items_from_inventory', 0)) + int(sl_2.get('total_items_from_inventory', 0))
-                            sl_1['total_items_to_purchase'] = int(sl_1.get('total_items_to_purchase', 0)) + int(sl_2.get('total_items_to_purchase', 0))
+                            # Sum totals; keep the first batch's value if either can't be parsed
+                            for field in SHOPPING_TOTAL_FIELDS:
+                                total = add_shopping_numbers(sl_1.get(field, 0), sl_2.get(field, 0))
+                                if total is not None:
+                                    sl_1[field] = total if field == 'total_estimated_cost' else int(total)
                     except Exception as e:
                         print(f"Error merging shopping lists: {e}")
                         
@@ -389,7 +521,6 @@ class MealPlanWorkflow:
                             
                             # Recalculate Inventory Utilization
                             # Utilization = (Items Used / Total Inventory Items) * 100
-                            total_inventory_count = len(inventory_df) if not inventory_df.empty else 0
                             items_used_count = int(merged_plan.get('recommendations', {}).get('shopping_list_summary', {}).get('total_items_from_inventory', 0))
                             
                             if total_inventory_count > 0:
@@ -430,14 +561,13 @@ class MealPlanWorkflow:
             })
             # Fallback to mock on error
             try:
-                agent = MealPlanAgentWithExtraction(self.session)
-                state['generated_plan'] = agent.generate_mock_meal_plan(profile)
+                state['generated_plan'] = self.meal_agent.generate_mock_meal_plan(profile)
             except:
                 state['generated_plan'] = None
             return state
 
     # ==================== AGENT 3.5: SHOPPING LIST CONSOLIDATOR ====================
-    def agent_consolidate_shopping_list(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
+    def agent_consolidate_shopping_list(self, state: UserPlanState) -> UserPlanState:
         """Consolidate shopping list to merge duplicates and normalize units"""
         if not state.get('generated_plan'):
             return state
@@ -450,37 +580,12 @@ class MealPlanWorkflow:
             
             if not shopping_list:
                 return state
-                
-            # Initialize agent
-            agent = MealPlanAgentWithExtraction(self.session)
-            if not agent.agent:
-                return state
-                
-            prompt = f"""
-            Analyze and consolidate this shopping list to merge duplicate items and normalize units.
-            
-            CURRENT LIST:
-            {json.dumps(shopping_list, indent=2)}
-            
-            INSTRUCTIONS:
-            1. Merge items that are the same but named slightly differently (e.g., "Onions" vs "Onion", "2 medium" vs "40g").
-            2. If units are compatible (e.g., grams and kg, or count), sum the quantities.
-            3. If units are different and hard to convert (e.g., "bunch" vs "g"), keep the most descriptive one or try to estimate.
-            4. Ensure the output has the EXACT same JSON structure as the input (keys: proteins, produce, pantry, grains, vegetables, fruits, dairy_alternatives).
-            5. Return ONLY the JSON object.
-            """
-            
-            response = agent.agent.invoke({"input": prompt})
-            raw_response = agent.process_agent_response(response)
-            consolidated_list = agent.extract_json_from_response(raw_response)
-            
-            if consolidated_list and isinstance(consolidated_list, dict):
-                # Update the plan with consolidated list
-                state['generated_plan']['recommendations']['shopping_list_summary'] = consolidated_list
-                print(f"[AGENT 3.5] Shopping list consolidated successfully")
-            else:
-                print(f"[AGENT 3.5] Failed to parse consolidated list, keeping original")
-                
+
+            # Deterministic merge (no LLM round trip): same item + compatible units are summed
+            consolidated_list = consolidate_shopping_list(shopping_list)
+            state['generated_plan']['recommendations']['shopping_list_summary'] = consolidated_list
+            print(f"[AGENT 3.5] Shopping list consolidated successfully")
+
             return state
             
         except Exception as e:
@@ -489,7 +594,7 @@ class MealPlanWorkflow:
             return state
     
     # ==================== AGENT 4: PLAN PERSISTER ====================
-    def agent_persist_plan(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
+    def agent_persist_plan(self, state: UserPlanState) -> UserPlanState:
         """Save generated plan to database with retry logic"""
         # If no user was processed, skip persistence
         if not state.get('current_user'):
@@ -510,7 +615,7 @@ class MealPlanWorkflow:
         
         print(f"[AGENT 4] Persisting plan for {user_id}")
         
-        cursor = self.conn.cursor()
+        cursor = self._get_cursor(user_id)
         try:
             # Save meal plan (using existing helpers)
             from utils.helpers import save_meal_plan
@@ -530,20 +635,10 @@ class MealPlanWorkflow:
             # Update planning_schedule
             next_date = datetime.now().date() + timedelta(days=7)
             
-            # Deactivate OTHER schedules to ensure no duplicates
-            cursor.execute("""
-                UPDATE planning_schedule 
-                SET status = 'INACTIVE' 
-                WHERE user_id = %s AND schedule_id != %s
-            """, (user_id, schedule_id))
-            
-            # Update current schedule
-            cursor.execute("""
-                UPDATE planning_schedule
-                SET next_plan_date = %s
-                WHERE schedule_id = %s
-            """, (next_date, schedule_id))
-            
+            # Single round trip: deactivate OTHER schedules (no duplicates)
+            # and advance next_plan_date on the current one
+            cursor.execute(SQL_UPDATE_SCHEDULE, (schedule_id, schedule_id, next_date, user_id))
+
             self.conn.commit()
             
             state['success_count'] += 1
@@ -565,61 +660,65 @@ class MealPlanWorkflow:
                     'timestamp': datetime.now().isoformat()
                 })
                 state['retry_count'] = 0
-        finally:
-            cursor.close()
         
         return state
     
     # ==================== ROUTING LOGIC ====================
-    def check_users_available(self, state: MealPlanGenerationState) -> str:
-        """Check if any users were found"""
-        if state['users_to_process'] and len(state['users_to_process']) > 0:
-            return 'process'
-        return 'end'
-
-    def route_next_step(self, state: MealPlanGenerationState) -> str:
-        """Decide next step: retry, next user, or end"""
-        # Check for retry
+    def node_fetch_users(self, state: MealPlanGenerationState) -> Dict[str, Any]:
+        """Run Agent 1 and return only its updates (errors is an additive channel)"""
+        fetched = self.agent_fetch_users({**state, 'users_to_process': [], 'errors': []})
+        self._release_cursor()
+        return {
+            'users_to_process': fetched['users_to_process'],
+            'errors': fetched['errors']
+        }
+
+    def dispatch_users(self, state: MealPlanGenerationState):
+        """Fan out one per-user pipeline per user found, or end if there are none"""
+        if not state['users_to_process']:
+            return END
+        return [
+            Send("process_user", UserPlanState(
+                current_date=state['current_date'],
+                current_user=user,
+                user_data=None,
+                generated_plan=None,
+                success_count=0,
+                failure_count=0,
+                errors=[],
+                retry_count=0
+            ))
+            for user in state['users_to_process']
+        ]
+
+    def node_process_user(self, state: UserPlanState) -> Dict[str, Any]:
+        """Run one user's pipeline and return only the counters/errors to merge"""
+        result = self.user_workflow.invoke(state)
+        return {
+            'success_count': result['success_count'],
+            'failure_count': result['failure_count'],
+            'errors': result['errors']
+        }
+
+    def route_next_step(self, state: UserPlanState) -> str:
+        """Decide next step for this user: retry or done"""
         if state['retry_count'] > 0 and state['retry_count'] <= self.max_retries:
             return 'retry'
         
-        # Move to next user
-        state['current_user_index'] += 1
-        state['retry_count'] = 0 # Reset retry count for next user
-        state['current_user'] = None # Clear current user
-        state['user_data'] = None # Clear user data
-        state['generated_plan'] = None # Clear plan
-        
-        if state['current_user_index'] < len(state['users_to_process']):
-            return 'next_user'
-        
-        return 'complete'
+        self._release_cursor(state['current_user']['user_id'])
+        return 'done'
     
     # ==================== BUILD WORKFLOW ====================
-    def build_workflow(self):
-        """Build LangGraph workflow"""
-        workflow = StateGraph(MealPlanGenerationState)
+    def build_user_workflow(self):
+        """Build the per-user subgraph: aggregate -> generate -> consolidate -> persist"""
+        workflow = StateGraph(UserPlanState)
         
-        # Add nodes
-        workflow.add_node("fetch_users", self.agent_fetch_users)
         workflow.add_node("aggregate_data", self.agent_aggregate_user_data)
         workflow.add_node("generate_plan", self.agent_generate_meal_plan)
         workflow.add_node("consolidate_list", self.agent_consolidate_shopping_list)
         workflow.add_node("persist_plan", self.agent_persist_plan)
         
-        # Define edges
-        workflow.set_entry_point("fetch_users")
-        
-        # Conditional edge from fetch_users
-        workflow.add_conditional_edges(
-            "fetch_users",
-            self.check_users_available,
-            {
-                "process": "aggregate_data",
-                "end": END
-            }
-        )
-        
+        workflow.set_entry_point("aggregate_data")
         workflow.add_edge("aggregate_data", "generate_plan")
         workflow.add_edge("generate_plan", "consolidate_list")
         workflow.add_edge("consolidate_list", "persist_plan")
@@ -630,14 +729,43 @@ class MealPlanWorkflow:
             self.route_next_step,
             {
                 "retry": "aggregate_data",  # Retry for same user
-                "next_user": "aggregate_data",  # Process next user
-                "complete": END
+                "done": END
             }
         )
         
         return workflow.compile()
+
+    def build_workflow(self):
+        """Build LangGraph workflow"""
+        self.user_workflow = self.build_user_workflow()
+        workflow = StateGraph(MealPlanGenerationState)
+        
+        # Add nodes
+        workflow.add_node("fetch_users", self.node_fetch_users)
+        workflow.add_node("process_user", self.node_process_user)
+        
+        # Define edges
+        workflow.set_entry_point("fetch_users")
+        
+        # Send one process_user task per user (runs in parallel)
+        workflow.add_conditional_edges("fetch_users", self.dispatch_users, ["process_user", END])
+        workflow.add_edge("process_user", END)
+        
+        return workflow.compile()
     
     # ==================== RUN METHOD ====================
+    def has_due_users(self, target_date: str) -> bool:
+        """Cheap COUNT check so idle runs skip building the graph"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(SQL_COUNT_DUE_USERS, (target_date,))
+            return cursor.fetchone()[0] > 0
+        except Exception as e:
+            print(f"Error counting due users, running full workflow: {e}")
+            return True
+        finally:
+            cursor.close()
+
     def run(self, target_date: str = None):
         """Execute the workflow"""
         if not target_date:
@@ -646,17 +774,19 @@ class MealPlanWorkflow:
         initial_state = MealPlanGenerationState(
             current_date=target_date,
             users_to_process=[],
-            current_user_index=0,
-            current_user=None,
-            user_data=None,
-            generated_plan=None,
             success_count=0,
             failure_count=0,
-            errors=[],
-            retry_count=0
+            errors=[]
         )
         
+        if not self.has_due_users(target_date):
+            print(f"No users need meal plans for {target_date}")
+            return initial_state
+        
         app = self.build_workflow()
-        final_state = app.invoke(initial_state)
+        try:
+            final_state = app.invoke(initial_state, config={"max_concurrency": self.max_concurrency})
+        finally:
+            self._release_all_cursors()
         
         return final_state
@@ -6,12 +6,315 @@ from langchain.schema import SystemMessage, HumanMessage, AIMessage, BaseMessage
 # Suppress the specific warning from ChatSnowflakeCortex about default parameters
 warnings.filterwarnings("ignore", message=".*is not default parameter.*")
 from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.config import get_stream_writer
 import json
 import os
 import re
-from datetime import datetime
+import time
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from utils.mcp_client import MealMindMCPClient
 
+try:
+    import orjson as fast_json  # Optional: faster parsing of LLM/MCP JSON
+except ImportError:
+    fast_json = json
+
+# Actions the planner may emit; anything else falls back to general_chat
+PLAN_ACTIONS = frozenset({
+    "meal_adjustment", "meal_retrieval", "calorie_estimation", "general_chat", "recipe_lookup"
+})
+
+# Flat JSON objects in an LLM reply, e.g. {"tool": "search_foods", "query": "..."}
+TOOL_CALL_RE = re.compile(r'\{[^{}]*\}')
+
+# Plan steps that may ask for search_foods and are re-run with the tool output
+TOOL_ACTIONS = frozenset({"calorie_estimation", "general_chat"})
+
+# Upper bound on search_foods round trips for a single plan step
+MAX_TOOL_ROUNDS = 10
+
+# Body of a ```json fenced block (closing fence optional, in case the reply was cut off)
+JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)\s*(?:```|$)', re.DOTALL)
+
+def strip_json_fence(content: str) -> str:
+    """Return the JSON inside a markdown code fence, or the content itself"""
+    match = JSON_FENCE_RE.search(content)
+    return match.group(1) if match else content.strip()
+
+# ==================== PLANNER FAST PATH ====================
+# Unambiguous single-intent inputs that don't need the LLM planner. Anything that could
+# change the plan (adjustments need a confirmation turn) or refers back to history
+# ("it", "this") is left to the LLM.
+GREETING_RE = re.compile(
+    r"^(?:hi|hello|hey|thanks|thank you|good (?:morning|afternoon|evening))(?:\s+there)?[\s!.]*$",
+    re.IGNORECASE
+)
+MEAL_RETRIEVAL_RE = re.compile(
+    r"^(?:what'?s|what is|show(?: me)?)\s+(?:for\s+)?(?:my\s+)?"
+    r"(?P<meal>breakfast|lunch|dinner|snack)s?"
+    r"(?:\s+(?:for\s+)?(?P<day>today|tomorrow))?\s*\??$",
+    re.IGNORECASE
+)
+CALORIE_QUERY_RE = re.compile(
+    r"^(?:how many\s+)?calories\s+(?:are\s+)?in\s+(?:an?\s+|one\s+)?(?P<food>[a-z][a-z\s\-]*?)\s*\??$",
+    re.IGNORECASE
+)
+HISTORY_REFERENCE_RE = re.compile(r"\b(?:it|this|that|these|those|them)\b", re.IGNORECASE)
+# "calories in my lunch today" is about the user's meal plan, not a food to estimate
+MEAL_PLAN_REFERENCE_RE = re.compile(
+    r"\b(?:my|our|breakfast|lunch|dinner|snacks?|meals?|today|tomorrow|yesterday|tonight|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|week)\b",
+    re.IGNORECASE
+)
+
+# Captured meal word -> meal_type as stored in meal_details
+FAST_MEAL_TYPES = {"breakfast": "breakfast", "lunch": "lunch", "dinner": "dinner", "snack": "snacks"}
+
+
+def fast_plan(user_input: str, request_date: str) -> Optional[List[Dict]]:
+    """Return a one-step plan for trivially classifiable input, or None to use the LLM"""
+    text = user_input.strip()
+    
+    if GREETING_RE.match(text):
+        return [{"action": "general_chat", "params": {"query": text}}]
+    
+    match = MEAL_RETRIEVAL_RE.match(text)
+    if match:
+        date = request_date
+        if (match.group('day') or '').lower() == 'tomorrow':
+            date = (datetime.strptime(request_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        return [{"action": "meal_retrieval", "params": {"meal_type": FAST_MEAL_TYPES[match.group('meal').lower()], "date": date}}]
+    
+    match = CALORIE_QUERY_RE.match(text)
+    if match and not (HISTORY_REFERENCE_RE.search(match.group('food')) or MEAL_PLAN_REFERENCE_RE.search(match.group('food'))):
+        return [{"action": "calorie_estimation", "params": {"query": match.group('food').strip()}}]
+    
+    return None
+
+# Wording that can carry a food preference; other messages skip the extraction LLM call
+FEEDBACK_SIGNAL_RE = re.compile(
+    r"\b(?:love|hate|like|dislike|enjoy|prefer|favou?rite|fan of|avoid|allerg\w*|intoleran\w*|"
+    r"don'?t|do not|can'?t eat|cannot eat|never|want|crav\w*|tired of|sick of|"
+    r"more|less|reduce|vegan|vegetarian|keto|gluten|dairy)\b",
+    re.IGNORECASE
+)
+
+
+def has_feedback_signal(user_input: str) -> bool:
+    """Cheap pre-filter for preference extraction"""
+    return bool(FEEDBACK_SIGNAL_RE.search(user_input))
+
+# Progress message shown while each graph node runs
+NODE_STATUS = {
+    "load_preferences": "Loading your preferences...",
+    "planner": "Planning actions...",
+    "meal_adjustment": "Adjusting meal...",
+    "meal_retrieval": "Retrieving data...",
+    "execute_tools": "Searching database...",
+}
+
+# How long the response step waits for the background health check before replying without it
+MONITOR_TIMEOUT_SECONDS = 15.0
+
+# Number of distinct search_foods queries kept per router instance
+SEARCH_CACHE_SIZE = 256
+
+# LLM plans reused for repeated identical requests (double clicks, retries)
+PLAN_CACHE_SIZE = 256
+PLAN_CACHE_TTL_SECONDS = 60.0
+# Plans that write are never replayed: the same words may confirm a different proposal
+UNCACHEABLE_PLAN_ACTIONS = frozenset({"meal_adjustment"})
+
+# Finished replies reused for repeated calorie questions. Only inputs fast_plan classifies
+# are cached (they don't depend on history), and only actions that don't read the user's
+# meals, which can be regenerated outside this chat.
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL_SECONDS = 120.0
+CACHEABLE_ACTIONS = frozenset({"calorie_estimation"})
+
+
+def request_cache_key(user_id: str, request_date: str, user_input: str, history: List[BaseMessage]) -> Optional[tuple]:
+    """Key for per-request caches, or None when the input depends on earlier messages"""
+    # Inputs that lean on earlier messages ("yes", "swap it") can't be reused across turns
+    if len(user_input.split()) <= 3 or HISTORY_REFERENCE_RE.search(user_input):
+        return None
+    # The planner also sees the last 5 messages, so they are part of the key
+    context = hash(tuple((type(m).__name__, m.content) for m in history[-5:]))
+    return (user_id, request_date, " ".join(user_input.lower().split()), context)
+
+# Smaller Cortex model for conversational steps; planning and meal edits stay on the main model
+FAST_CHAT_MODEL = "llama3.1-8b"
+
+# Response templates
+DAILY_TOTAL_TEMPLATE = (
+    "**New Daily Total:**\n"
+    "- Calories: {calories} kcal\n"
+    "- Protein: {protein_g}g\n"
+    "- Carbs: {carbohydrates_g}g\n"
+    "- Fat: {fat_g}g\n"
+    "- Fiber: {fiber_g}g\n"
+)
+RETRIEVED_MEAL_TEMPLATE = (
+    "**{meal_type} ({meal_date})**\n"
+    "{meal_name}\n"
+    "Calories: {calories} | Protein: {protein_g}g\n"
+    "Ingredients: {ingredients}\n\n"
+)
+
+# ==================== PROMPTS ====================
+PLANNER_SYSTEM_PROMPT = """You are the Orchestrator for Meal Mind AI.
+            Today is {today}.
+            
+            Your goal is to break down the user's request into a list of executable actions.
+            
+            Available Actions:
+            1. "meal_adjustment": Add, remove, replace, or report food.
+               Params: "meal_type" (breakfast/lunch/dinner/snack), "date" (YYYY-MM-DD), "instruction" (what to do).
+               
+            2. "meal_retrieval": Show meal plan, get recipe, check ingredients.
+               Params: "meal_type" (optional), "date" (YYYY-MM-DD).
+               
+            3. "calorie_estimation": Estimate calories/nutrition for a food item (not in plan).
+               Params: "query" (the food name).
+               - Use this when user asks "nutrition for X", "calories in X", or "breakdown of X".
+               - If user says "nutrition for it", RESOLVE "it" from history.
+               
+            4. "general_chat": Greetings, nutrition advice, questions not about the specific meal plan.
+               Params: "query".
+            
+            5. "recipe_lookup": If the user asks for a recipe, ingredients, how to cook something, OR "what can I cook with my ingredients".
+               Params: "query" (the dish name or the user's question).
+            
+            RULES:
+            - If the user asks to modify multiple meals (e.g. "Add coffee to breakfast and remove tea from lunch"), create TWO "meal_adjustment" steps.
+            - If the user refers to "this", "that", "it", or "the recipe" (e.g., "add this to dinner"), you MUST resolve what they are referring to from the CHAT HISTORY.
+              - Example: If the previous message was about "Oatmeal", and user says "add this", the instruction should be "Add Oatmeal".
+              - Do NOT pass ambiguous instructions like "add this" or "add the item".
+            - DISTINGUISH BETWEEN HYPOTHETICALS AND ACTIONS:
+              - "How about adding garlic?", "What if I add cheese?", "Can I add nuts?" -> Use "general_chat" or "calorie_estimation" to discuss the change.
+              - "Add garlic to my lunch", "Update lunch with garlic", "I ate garlic" -> CHECK FOR CONFIRMATION.
+            - HANDLING PREFERENCES:
+              - If the user states a preference (e.g., "I like mushrooms", "I hate onions", "I prefer spicy food"), DO NOT generate a "meal_adjustment".
+              - Use "general_chat" to acknowledge the preference. The system will automatically learn it for future plans.
+              - Do NOT ask if they want to update the current plan unless they explicitly asked to "add" or "use" it now.
+            - CONFIRMATION RULE (STRICT):
+              - Before generating a "meal_adjustment" action, check the CHAT HISTORY.
+              - If the user has NOT explicitly confirmed (e.g., "Yes", "Do it", "Confirm") in the last message, you MUST output a "general_chat" action with the query: "Please ask the user to confirm if they want to update their [meal]."
+              - ONLY generate "meal_adjustment" if the user has confirmed.
+            - For "meal_adjustment", the `instruction` parameter must be specific (e.g., "Add 2 slices of pizza", "Replace lunch with Chicken Salad").
+            - If the user asks "What is for lunch and dinner?", create TWO "meal_retrieval" steps.
+            - Always extract the DATE relative to {today}.
+            - Return ONLY a JSON list of objects.
+            """
+
+PLANNER_USER_PROMPT = """User Request: "{user_input}"
+            
+            Output Format:
+            [
+                {{"action": "meal_adjustment", "params": {{"meal_type": "breakfast", "date": "2025-12-06", "instruction": "Add coffee"}}}},
+                ...
+            ]
+            """
+
+ESTIMATION_SYSTEM_PROMPT = """You are an expert nutritionist and calorie estimator. 
+The user will describe a meal (e.g., from a buffet, restaurant, or home cooking).
+
+TOOLS AVAILABLE:
+1. search_foods(query: str): Search for nutritional information about specific foods. Use this when you need to know calories, macros, or ingredients for a food item that is not in the context.
+
+INSTRUCTIONS:
+- Use the `search_foods` tool to retrieve nutritional information. Without Exception use this, At maximum, you can use this tool 20 times.
+- IF you have already received tool outputs containing the necessary information, DO NOT call the tool again. Proceed to generate the final response.
+- **COMPOSITE DISHES (e.g., "Paneer Burji", "Chicken Sandwich"):**
+  - Do NOT just search for the full dish name.
+  - BREAK IT DOWN into main ingredients.
+  - Call `search_foods` for EACH main ingredient separately.
+  - Example: For "Paneer Burji", search for "paneer", "onion", "tomato", "ghee".
+  - Example: For "Chicken Sandwich", search for "bread", "chicken breast", "lettuce", "mayonnaise".
+- **SIMPLE FOODS (e.g., "Apple", "Egg"):**
+  - Search for the item directly.
+- FORMAT: {"tool": "search_foods", "query": "ingredient_name"}
+- You can output MULTIPLE tool calls in one response.
+- Do NOT output any text before the tool calls.
+- Do NOT output anything else if you are calling tools.
+
+- HANDLING SEARCH RESULTS:
+  - Aggregate the nutrition from the ingredients to estimate the total for the dish.
+  - If multiple variations are returned, choose the most relevant one.
+  - Synthesize the information into a helpful response.
+
+- FINAL OUTPUT FORMAT:
+  - Do NOT mention "search_foods", "tools", "database", or "I used a tool" in your final response.
+  - Present the information naturally as if you already knew it.
+  - Show the breakdown of ingredients if applicable.
+- Analyze the food items described.
+- Estimate portion sizes if not specified.
+- Calculate the approximate Calories and Macronutrients.
+- Provide a clear breakdown.
+- Offer a brief, non-judgmental health tip.
+
+Format the output using Markdown:
+- Use bold for totals.
+- Use a list for the breakdown.
+"""
+ESTIMATION_SYSTEM_MESSAGE = SystemMessage(content=ESTIMATION_SYSTEM_PROMPT)
+
+# Static part of the general chat prompt. It comes first so every turn shares the same
+# prompt prefix (eligible for provider-side prefix caching); the per-user context follows.
+GENERAL_CHAT_SYSTEM_PROMPT = """You are Meal Mind AI, a helpful nutrition and meal planning assistant.
+
+TOOLS AVAILABLE:
+1. search_foods(query: str): Search for nutritional information about specific foods. Use this when you need to know calories, macros, or ingredients for a food item that is not in the context.
+
+INSTRUCTIONS:
+- Use the `search_foods` tool to verify nutritional claims or get specific data from the database.
+- FORMAT: {"tool": "search_foods", "query": "apple pie"}
+- Do NOT output anything else if you are calling a tool.
+- If you have enough information (or after tool use), answer the user directly.
+- HANDLING SEARCH RESULTS:
+  - If multiple variations are returned (e.g., raw, boiled, fried), choose the most relevant one based on the user's description.
+  - If the user didn't specify preparation, present the most common form (e.g., "cooked" or "raw") or briefly summarize the options (e.g., "Raw: 33 kcal, Cooked: 59 kcal").
+  - Do NOT simply list the raw database records. Synthesize the information into a helpful response.
+- FINAL OUTPUT FORMAT:
+  - Do NOT mention "search_foods", "tools", "database", or "I used a tool" in your final response.
+  - Present the information naturally as if you already knew it.
+- Provide nutrition advice and cooking tips considering user preferences
+- Answer health and wellness questions
+- Be encouraging and supportive
+- Keep responses concise and helpful
+- IMPORTANT: Respect user dislikes and preferences in your suggestions
+"""
+
+# ==================== CHECKPOINTER ====================
+class BoundedMemorySaver(MemorySaver):
+    """MemorySaver that keeps only the most recently used max_threads threads"""
+    
+    def __init__(self, max_threads: int = 1024):
+        super().__init__()
+        self.max_threads = max_threads
+        self._thread_order = OrderedDict()
+        self._order_lock = threading.Lock()
+    
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        
+        with self._order_lock:
+            self._thread_order[thread_id] = None
+            self._thread_order.move_to_end(thread_id)
+            evicted = []
+            while len(self._thread_order) > self.max_threads:
+                evicted.append(self._thread_order.popitem(last=False)[0])
+        
+        for old_thread_id in evicted:
+            self.delete_thread(old_thread_id)
+        return saved
+
 # ==================== LANGGRAPH STATE ====================
 class ChatRouterState(TypedDict):
     user_input: str
@@ -20,6 +323,12 @@ class ChatRouterState(TypedDict):
     inventory_summary: str
     meal_plan_summary: str
     chat_history: List[BaseMessage]
+    user_preferences: Dict
+    
+    # Stamped once per turn by the entry node so every step agrees on "today"
+    request_date: str  # YYYY-MM-DD
+    request_today_str: str  # e.g. "Monday, December 08, 2025"
+    turn_id: str  # Keys per-turn background work such as health monitoring
     
     # Plan: List of steps to execute
     # Each step: {"action": "meal_adjustment"|"meal_retrieval"|"calorie_estimation"|"general_chat", "params": {...}}
@@ -52,6 +361,10 @@ class MealRouterAgent:
                 session=self.session,
                 model="openai-gpt-4.1"
             )
+            self.fast_model = ChatSnowflakeCortex(
+                session=self.session,
+                model=FAST_CHAT_MODEL
+            )
             
             # Initialize MCP Client for Context Retrieval
             try:
@@ -72,33 +385,67 @@ class MealRouterAgent:
         except Exception as e:
             st.warning(f"Router LLM init failed: {e}")
             self.chat_model = None
+            self.fast_model = None
             
         # Initialize Sub-Agents
         from utils.meal_adjustment_agent import MealAdjustmentAgent
-        self.adjustment_agent = MealAdjustmentAgent(session, conn)
+        self.adjustment_agent = MealAdjustmentAgent(session, conn, chat_model=self.chat_model, mcp_client=getattr(self, 'mcp_client', None))
         
         from utils.monitoring_agent import MonitoringAgent
         self.monitoring_agent = MonitoringAgent(conn)
         
         from utils.feedback_agent import FeedbackAgent
         self.feedback_agent = FeedbackAgent(conn, session)
+        
+        # user_id -> (loaded_at, preferences, prompt text); expired after _pref_ttl seconds
+        self._pref_cache = {}
+        self._pref_ttl = 300.0  # Writes made through chat invalidate sooner
+        
+        # Normalized search_foods query -> formatted result, least recently used first
+        self._search_cache = OrderedDict()
+        
+        # (user_id, date, normalized input, recent history hash) -> (created_at, plan), oldest first
+        self._plan_cache = OrderedDict()
+        
+        # (user_id, date, normalized input) -> (created_at, reply text) for fast-path calorie questions
+        self._response_cache = OrderedDict()
+        
+        # Both caches above are also invalidated from the extractor thread
+        self._cache_lock = threading.Lock()
+        
+        # Preference extraction runs off the response path; the semaphore caps queued jobs
+        self._extractor = ThreadPoolExecutor(max_workers=2)
+        self._extraction_slots = threading.BoundedSemaphore(8)
+        
+        # Health monitoring overlaps with the rest of the plan; turn_id -> latest Future
+        self._monitor_pool = ThreadPoolExecutor(max_workers=4)
+        self._monitor_futures = {}
+        
+        # Users whose meal plan was changed by chat since the UI last checked
+        self._changed_meal_plans = set()
+        
+        # Independent meal_retrieval steps in one plan are fetched concurrently
+        self._retrieval_pool = ThreadPoolExecutor(max_workers=4)
 
         from utils.recipe_agent import RecipeAgent
         self.recipe_agent = RecipeAgent(session)
 
+        # Plan action -> step handler; unknown actions fall back to general_chat
+        self._step_handlers = {
+            "meal_retrieval": self.node_retrieve_meals,
+            "meal_adjustment": self.node_adjust_meal,
+            "calorie_estimation": self.node_estimate_calories,
+            "general_chat": self.node_general_chat,
+            "recipe_lookup": self.node_provide_recipe,
+        }
+
         # Build Graph
         workflow = StateGraph(ChatRouterState)
         
         # Add Nodes
         workflow.add_node("load_preferences", self.node_load_preferences)
-        workflow.add_node("extract_feedback", self.node_extract_feedback)
         workflow.add_node("planner", self.node_planner)
-        workflow.add_node("meal_retrieval", self.node_retrieve_meals)
-        workflow.add_node("meal_adjustment", self.node_adjust_meal)
-        workflow.add_node("calorie_estimation", self.node_estimate_calories)
-        workflow.add_node("general_chat", self.node_general_chat)
-        workflow.add_node("execute_tools", self.node_execute_tools)
-        workflow.add_node("recipe_lookup", self.node_provide_recipe)
+        workflow.add_node("execute_plan", self.node_execute_plan)
         workflow.add_node("generate_response", self.node_generate_response)
         
         # Set Entry Point
@@ -107,65 +454,33 @@ class MealRouterAgent:
         # Edge: Load Prefs -> Planner
         workflow.add_edge("load_preferences", "planner")
         
-        # Conditional Edges from Planner
-        workflow.add_conditional_edges(
-            "planner",
-            self.decide_route,
-            {
-                "meal_retrieval": "meal_retrieval",
-                "meal_adjustment": "meal_adjustment",
-                "calorie_estimation": "calorie_estimation",
-                "general_chat": "general_chat",
-                "recipe_lookup": "recipe_lookup",
-                "generate_response": "generate_response"
-            }
-        )
-        
-        # Conditional Edges from Action Nodes (for Tool Use)
-        workflow.add_conditional_edges(
-            "calorie_estimation",
-            self.decide_next_step_after_action,
-            {
-                "execute_tools": "execute_tools",
-                "planner": "planner"
-            }
-        )
-        
-        workflow.add_conditional_edges(
-            "general_chat",
-            self.decide_next_step_after_action,
-            {
-                "execute_tools": "execute_tools",
-                "generate_response": "generate_response"
-            }
-        )
-        
-        # Tool Execution -> Return to Active Node
-        workflow.add_conditional_edges(
-            "execute_tools",
-            self.return_from_tools,
-            {
-                "calorie_estimation": "calorie_estimation",
-                "general_chat": "general_chat"
-            }
-        )
-        
-        # Edges from other Action Nodes -> Back to Planner
-        workflow.add_edge("meal_retrieval", "planner")
-        workflow.add_edge("meal_adjustment", "planner")
-        workflow.add_edge("recipe_lookup", "planner")
+        # Planner -> Execute Plan -> Response (steps run inside execute_plan, no planner loop)
+        workflow.add_edge("planner", "execute_plan")
+        workflow.add_edge("execute_plan", "generate_response")
         
-        # Response -> Feedback Extraction -> END
-        workflow.add_edge("generate_response", "extract_feedback")
-        workflow.add_edge("extract_feedback", END)
+        # Response -> END (feedback extraction runs in the background, see run_chat_stream)
+        workflow.add_edge("generate_response", END)
         
-        # Compile
-        from langgraph.checkpoint.memory import MemorySaver
-        checkpointer = MemorySaver()
-        self.app = workflow.compile(checkpointer=checkpointer)
+        # Compile: checkpointed for threaded chats, plain for one-off calls without a thread_id
+        self.app = workflow.compile(checkpointer=BoundedMemorySaver())
+        self.stateless_app = workflow.compile()
 
     def _retrieve_context(self, query: str) -> str:
-        """Retrieve relevant food data using MCP"""
+        """Retrieve relevant food data using MCP, reusing results for repeated queries"""
+        key = " ".join(query.lower().split())
+        if key in self._search_cache:
+            self._search_cache.move_to_end(key)
+            return self._search_cache[key]
+        
+        result = self._search_foods(query)
+        if not result.startswith("Error"):
+            self._search_cache[key] = result
+            if len(self._search_cache) > SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+        return result
+
+    def _search_foods(self, query: str) -> str:
+        """Run search_foods over MCP and format the records"""
         if not self.mcp_client:
             return "Error: MCP Client not available."
             
@@ -188,7 +503,7 @@ class MealRouterAgent:
                 if item.get("type") == "text":
                     text = item.get("text")
                     try:
-                        data = json.loads(text)
+                        data = fast_json.loads(text)
                         
                         def format_record(record):
                             if isinstance(record, str): return record
@@ -216,200 +531,229 @@ class MealRouterAgent:
             return f"Error executing search: {str(e)}"
 
     # ==================== MEMORY NODES ====================
-    def node_load_preferences(self, state: ChatRouterState) -> ChatRouterState:
-        """Load user preferences from long-term memory"""
-        # If already pre-loaded, skip DB call
-        if state.get('user_preferences'):
-            return state
-            
-        preferences = self.feedback_agent.get_user_preferences(state['user_id'])
-        state['user_preferences'] = preferences
-        return state
-
-    def node_extract_feedback(self, state: ChatRouterState) -> ChatRouterState:
-        """Extract preferences from user message"""
-        # We can extract from user_input
-        extracted = self.feedback_agent.extract_preferences(
-            state['user_input'], 
-            state['user_id']
-        )
-        return state
+    def invalidate_preferences(self, user_id: str):
+        """Force the next turn to reload preferences (call after saving feedback)"""
+        # Expire rather than drop, so a stale pre-loaded copy isn't reused either
+        self._pref_cache[user_id] = (float('-inf'), None, None)
+        with self._cache_lock:
+            for key in [k for k in self._plan_cache if k[0] == user_id]:
+                self._plan_cache.pop(key, None)
+        self.invalidate_responses(user_id)
+
+    def invalidate_responses(self, user_id: str):
+        """Drop cached replies for a user (their meals or preferences changed)"""
+        with self._cache_lock:
+            for key in [k for k in self._response_cache if k[0] == user_id]:
+                self._response_cache.pop(key, None)
+
+    def pop_meal_plan_change(self, user_id: str) -> bool:
+        """True once after a chat turn changed the user's meal plan (so the UI can drop cached reads)"""
+        if user_id in self._changed_meal_plans:
+            self._changed_meal_plans.discard(user_id)
+            return True
+        return False
+
+    def _cache_lookup(self, cache: OrderedDict, key: tuple, ttl: float):
+        """Return the cached value for key if it is younger than ttl seconds"""
+        with self._cache_lock:
+            entry = cache.get(key)
+        if entry and time.monotonic() - entry[0] < ttl:
+            return entry[1]
+        return None
+
+    def _cache_store(self, cache: OrderedDict, key: tuple, value, max_size: int):
+        """Insert value as the newest entry, evicting the oldest past max_size"""
+        with self._cache_lock:
+            cache.pop(key, None)
+            cache[key] = (time.monotonic(), value)
+            if len(cache) > max_size:
+                cache.popitem(last=False)
+
+    def _cache_preferences(self, user_id: str, loaded_at: float, preferences: Dict):
+        """Store preferences along with their prompt formatting"""
+        pref_text = self.feedback_agent.format_preferences_for_prompt(preferences)
+        self._pref_cache[user_id] = (loaded_at, preferences, pref_text)
+
+    def node_load_preferences(self, state: ChatRouterState) -> Dict[str, Any]:
+        """Load user preferences from long-term memory and stamp the request date and turn id"""
+        request_now = datetime.now()
+        updates = {
+            'request_date': request_now.strftime('%Y-%m-%d'),
+            'request_today_str': request_now.strftime('%A, %B %d, %Y'),
+            'turn_id': uuid.uuid4().hex
+        }
+        
+        user_id = state['user_id']
+        now = time.monotonic()
+        cached = self._pref_cache.get(user_id)
+        
+        if cached and now - cached[0] < self._pref_ttl:
+            updates['user_preferences'] = cached[1]
+        elif cached is None and state.get('user_preferences'):
+            # Pre-loaded by the caller, skip DB call
+            self._cache_preferences(user_id, now, state['user_preferences'])
+        else:
+            preferences = self.feedback_agent.get_user_preferences(user_id)
+            self._cache_preferences(user_id, now, preferences)
+            updates['user_preferences'] = preferences
+        return updates
+
+    def extract_feedback(self, user_input: str, user_id: str):
+        """Extract preferences from user message (runs on the extractor pool)"""
+        try:
+            extracted = self.feedback_agent.extract_preferences(user_input, user_id)
+            if extracted:
+                self.invalidate_preferences(user_id)
+        except Exception as e:
+            print(f"ERROR: Background feedback extraction failed: {e}")
+        finally:
+            self._extraction_slots.release()
+
+    def submit_feedback_extraction(self, user_input: str, user_id: str):
+        """Queue preference extraction without blocking the response"""
+        if not has_feedback_signal(user_input):
+            return
+        if not self._extraction_slots.acquire(blocking=False):
+            print("DEBUG: Feedback extraction queue full, skipping this turn")
+            return
+        self._extractor.submit(self.extract_feedback, user_input, user_id)
+
+    def _invoke_fast(self, messages: List[BaseMessage]):
+        """Invoke the small model, escalating to the main model if it fails or returns nothing"""
+        try:
+            response = self.fast_model.invoke(messages)
+            if response.content.strip():
+                return response
+            print("DEBUG: Fast model returned an empty reply, escalating")
+        except Exception as e:
+            print(f"ERROR: Fast model failed, escalating: {e}")
+        return self.chat_model.invoke(messages)
 
     # ==================== PLANNER NODE ====================
-    def node_planner(self, state: ChatRouterState) -> ChatRouterState:
+    def node_planner(self, state: ChatRouterState) -> Dict[str, Any]:
         """
         LLM-based Planner.
         """
         print("DEBUG: Entering node_planner")
         
-        if not state.get('plan'):
-            # RESET TRANSIENT STATE
-            # This ensures that results from previous turns (like recipes) don't persist
-            # into unrelated new requests.
-            state['recipe_result'] = None
-            state['adjustment_result'] = None
-            state['estimation_result'] = None
-            state['retrieved_data'] = None
-            state['tool_calls'] = []
-            state['tool_outputs'] = []
-
-            
-            # Generate Plan
-            user_input = state['user_input']
-            today = datetime.now().strftime('%A, %B %d, %Y')
-            
-            system_prompt = f"""You are the Orchestrator for Meal Mind AI.
-            Today is {today}.
-            
-            Your goal is to break down the user's request into a list of executable actions.
-            
-            Available Actions:
-            1. "meal_adjustment": Add, remove, replace, or report food.
-               Params: "meal_type" (breakfast/lunch/dinner/snack), "date" (YYYY-MM-DD), "instruction" (what to do).
-               
-            2. "meal_retrieval": Show meal plan, get recipe, check ingredients.
-               Params: "meal_type" (optional), "date" (YYYY-MM-DD).
-               
-            3. "calorie_estimation": Estimate calories/nutrition for a food item (not in plan).
-               Params: "query" (the food name).
-               - Use this when user asks "nutrition for X", "calories in X", or "breakdown of X".
-               - If user says "nutrition for it", RESOLVE "it" from history.
-               
-            4. "general_chat": Greetings, nutrition advice, questions not about the specific meal plan.
-               Params: "query".
-            
-            5. "recipe_lookup": If the user asks for a recipe, ingredients, how to cook something, OR "what can I cook with my ingredients".
-               Params: "query" (the dish name or the user's question).
+        # RESET TRANSIENT STATE
+        # This ensures that results from previous turns (like recipes) don't persist
+        # into unrelated new requests.
+        updates = {
+            'recipe_result': None,
+            'adjustment_result': None,
+            'estimation_result': None,
+            'retrieved_data': None,
+            'tool_calls': [],
+            'tool_outputs': []
+        }
+        
+        # Generate Plan
+        user_input = state['user_input']
+        
+        plan = fast_plan(user_input, state['request_date'])
+        if plan:
+            print(f"DEBUG: Fast-path plan: {plan}")
+            updates['plan'] = plan
+            updates['current_step_index'] = 0
+            return updates
+        
+        history = state.get('chat_history', [])
+        cache_key = request_cache_key(state['user_id'], state['request_date'], user_input, history)
+        if cache_key:
+            cached_plan = self._cache_lookup(self._plan_cache, cache_key, PLAN_CACHE_TTL_SECONDS)
+            if cached_plan:
+                print(f"DEBUG: Reusing cached plan: {cached_plan}")
+                updates['plan'] = cached_plan
+                updates['current_step_index'] = 0
+                return updates
+        
+        today = state['request_today_str']
+        
+        system_prompt = PLANNER_SYSTEM_PROMPT.format(today=today)
+        user_prompt = PLANNER_USER_PROMPT.format(user_input=user_input)
+        
+        try:
+            # Prepare messages with history
+            messages = [SystemMessage(content=system_prompt)]
             
-            RULES:
-            - If the user asks to modify multiple meals (e.g. "Add coffee to breakfast and remove tea from lunch"), create TWO "meal_adjustment" steps.
-            - If the user refers to "this", "that", "it", or "the recipe" (e.g., "add this to dinner"), you MUST resolve what they are referring to from the CHAT HISTORY.
-              - Example: If the previous message was about "Oatmeal", and user says "add this", the instruction should be "Add Oatmeal".
-              - Do NOT pass ambiguous instructions like "add this" or "add the item".
-            - DISTINGUISH BETWEEN HYPOTHETICALS AND ACTIONS:
-              - "How about adding garlic?", "What if I add cheese?", "Can I add nuts?" -> Use "general_chat" or "calorie_estimation" to discuss the change.
-              - "Add garlic to my lunch", "Update lunch with garlic", "I ate garlic" -> CHECK FOR CONFIRMATION.
-            - HANDLING PREFERENCES:
-              - If the user states a preference (e.g., "I like mushrooms", "I hate onions", "I prefer spicy food"), DO NOT generate a "meal_adjustment".
-              - Use "general_chat" to acknowledge the preference. The system will automatically learn it for future plans.
-              - Do NOT ask if they want to update the current plan unless they explicitly asked to "add" or "use" it now.
-            - CONFIRMATION RULE (STRICT):
-              - Before generating a "meal_adjustment" action, check the CHAT HISTORY.
-              - If the user has NOT explicitly confirmed (e.g., "Yes", "Do it", "Confirm") in the last message, you MUST output a "general_chat" action with the query: "Please ask the user to confirm if they want to update their [meal]."
-              - ONLY generate "meal_adjustment" if the user has confirmed.
-            - For "meal_adjustment", the `instruction` parameter must be specific (e.g., "Add 2 slices of pizza", "Replace lunch with Chicken Salad").
-            - If the user asks "What is for lunch and dinner?", create TWO "meal_retrieval" steps.
-            - Always extract the DATE relative to {today}.
-            - Return ONLY a JSON list of objects.
-            """
+            # Add recent history (last 5 messages) for context resolution
+            messages.extend(history[-5:])
+                
+            messages.append(HumanMessage(content=user_prompt))
             
-            user_prompt = f"""User Request: "{user_input}"
+            response = self.chat_model.invoke(messages)
+            plan = fast_json.loads(strip_json_fence(response.content))
+            if not isinstance(plan, list):
+                plan = [plan]
+                
+            updates['plan'] = plan
+            updates['current_step_index'] = 0
+            print(f"DEBUG: Generated Plan: {json.dumps(plan, indent=2)}")
             
-            Output Format:
-            [
-                {{"action": "meal_adjustment", "params": {{"meal_type": "breakfast", "date": "2025-12-06", "instruction": "Add coffee"}}}},
-                ...
-            ]
-            """
+            if cache_key and not any(isinstance(step, dict) and step.get('action') in UNCACHEABLE_PLAN_ACTIONS for step in plan):
+                self._cache_store(self._plan_cache, cache_key, plan, PLAN_CACHE_SIZE)
             
-            try:
-                # Prepare messages with history
-                messages = [SystemMessage(content=system_prompt)]
-                
-                # Add recent history (last 5 messages) for context resolution
-                history = state.get('chat_history', [])
-                recent_history = history[-5:]
-                for msg in recent_history:
-                    messages.append(msg)
-                    
-                messages.append(HumanMessage(content=user_prompt))
-                
-                response = self.chat_model.invoke(messages)
-                content = response.content.strip()
-                if "```" in content:
-                    content = content.split("```")[1]
-                    if content.startswith("json"):
-                        content = content[4:]
-                
-                plan = json.loads(content.strip())
-                if not isinstance(plan, list):
-                    plan = [plan]
-                    
-                state['plan'] = plan
-                state['current_step_index'] = 0
-                print(f"DEBUG: Generated Plan: {json.dumps(plan, indent=2)}")
-                
-            except Exception as e:
-                print(f"ERROR: Planner failed: {e}")
-                state['plan'] = [{"action": "general_chat", "params": {"query": user_input}}]
-                state['current_step_index'] = 0
-        else:
-            # We are looping back. Increment index.
-            state['current_step_index'] += 1
-            print(f"DEBUG: Incrementing step to {state['current_step_index']}")
-        
-        return state
+        except Exception as e:
+            print(f"ERROR: Planner failed: {e}")
+            updates['plan'] = [{"action": "general_chat", "params": {"query": user_input}}]
+            updates['current_step_index'] = 0
+        return updates
 
-    def decide_route(self, state: ChatRouterState) -> str:
-        """Dispatch based on current step in plan"""
-        plan = state.get('plan', [])
-        idx = state.get('current_step_index', 0)
+    # ==================== PLAN EXECUTION ====================
+    def node_execute_plan(self, state: ChatRouterState) -> Dict[str, Any]:
+        """Run every plan step in order inside one node instead of looping back through the planner"""
+        dispatch = self._step_handlers
+        write_status = get_stream_writer()
         
-        if idx >= len(plan):
-            return "generate_response"
-            
-        step = plan[idx]
-        action = step.get('action')
+        # Steps see the results of earlier steps through this working copy
+        local = dict(state)
+        updates = {}
         
-        print(f"DEBUG: Dispatching to {action} (Step {idx+1}/{len(plan)})")
+        def apply(delta):
+            local.update(delta)
+            updates.update(delta)
         
-        if action in ["meal_adjustment", "meal_retrieval", "calorie_estimation", "general_chat", "recipe_lookup"]:
-            return action
+        plan = local.get('plan', [])
+        idx = local.get('current_step_index', 0)
+        while idx < len(plan):
+            action = plan[idx].get('action')
+            action = action if action in PLAN_ACTIONS else "general_chat"
+            print(f"DEBUG: Dispatching to {action} (Step {idx+1}/{len(plan)})")
+            local['current_step_index'] = idx
             
-        return "general_chat"
-
-    def decide_next_step_after_action(self, state: ChatRouterState) -> str:
-        """Decide whether to execute tools or continue"""
-        if state.get('tool_calls'):
-            return "execute_tools"
-        
-        # If no tools, where do we go?
-        # calorie_estimation -> planner (to next step)
-        # general_chat -> generate_response (usually last step)
-        
-        # We need to know which node we came from, but LangGraph doesn't pass that easily.
-        # However, we can infer from the current action in plan.
+            if action in NODE_STATUS:
+                write_status({"status": NODE_STATUS[action]})
+            apply(dispatch[action](local))
+            
+            if action in TOOL_ACTIONS:
+                rounds = 0
+                while local.get('tool_calls') and rounds < MAX_TOOL_ROUNDS:
+                    write_status({"status": NODE_STATUS["execute_tools"]})
+                    apply(self.node_execute_tools(local))
+                    apply(dispatch[action](local))
+                    rounds += 1
+                
+                # General chat answers the user directly; remaining steps are not run
+                if action == "general_chat":
+                    break
+            
+            # meal_retrieval may have consumed the steps right after it
+            idx = local['current_step_index'] + 1
+            apply({'current_step_index': idx})
         
-        plan = state.get('plan', [])
-        idx = state.get('current_step_index', 0)
-        if idx < len(plan):
-            action = plan[idx]['action']
-            if action == 'calorie_estimation':
-                return "planner"
-            elif action == 'general_chat':
-                return "generate_response"
-            elif action == 'recipe_lookup':
-                return "generate_response"
-        
-        return "generate_response"
-
-    def return_from_tools(self, state: ChatRouterState) -> str:
-        """Return to the active node after tool execution"""
-        active = state.get('active_node')
-        if active:
-            return active
-        return 'general_chat'
+        return updates
 
     # ==================== ACTION NODES ====================
     
-    def node_adjust_meal(self, state: ChatRouterState) -> ChatRouterState:
+    def node_adjust_meal(self, state: ChatRouterState) -> Dict[str, Any]:
         """Execute meal adjustment step"""
         idx = state['current_step_index']
         step = state['plan'][idx]
         params = step['params']
         
         user_id = state['user_id']
-        date = params.get('date', datetime.now().strftime('%Y-%m-%d'))
+        date = params.get('date', state['request_date'])
         meal_type = params.get('meal_type', 'breakfast')
         instruction = params.get('instruction', state['user_input'])
         
@@ -424,46 +768,63 @@ class MealRouterAgent:
         if prev_result:
             result['message'] = prev_result['message'] + "\n" + result['message']
         
-        state['adjustment_result'] = result
+        self.invalidate_responses(user_id)
+        self._changed_meal_plans.add(user_id)
         
-        # Trigger monitoring
-        warnings = self.monitoring_agent.monitor_changes(user_id, date)
-        state['monitoring_warnings'] = warnings
+        # Trigger monitoring in the background; collected in node_generate_response
+        self._monitor_futures[state['turn_id']] = self._monitor_pool.submit(
+            self.monitoring_agent.monitor_changes, user_id, date
+        )
         
-        return state
+        return {'adjustment_result': result}
 
 
 
-    def node_retrieve_meals(self, state: ChatRouterState) -> ChatRouterState:
-        """Retrieve meal data"""
+    def node_retrieve_meals(self, state: ChatRouterState) -> Dict[str, Any]:
+        """Retrieve meal data for this step and any meal_retrieval steps right after it"""
         from utils.db import get_meals_by_criteria
         
+        plan = state['plan']
         idx = state['current_step_index']
-        step = state['plan'][idx]
-        params = step['params']
+        last = idx
+        while last + 1 < len(plan) and plan[last + 1].get('action') == 'meal_retrieval':
+            last += 1
+        steps = plan[idx:last + 1]
         
         user_id = state['user_id']
-        date = params.get('date')
-        meal_type = params.get('meal_type')
-        
-        meals = get_meals_by_criteria(self.conn, user_id, day_number=None, meal_type=meal_type, meal_date=date)
-        
-        formatted = ""
-        if meals:
-            for m in meals:
-                formatted += f"**{m['meal_type'].title()} ({m['meal_date']})**\n"
-                formatted += f"{m['meal_name']}\n"
-                formatted += f"Calories: {m['nutrition']['calories']} | Protein: {m['nutrition']['protein_g']}g\n"
-                formatted += f"Ingredients: {', '.join([i['ingredient'] for i in m['ingredients_with_quantities']])}\n\n"
+        
+        def fetch(step):
+            params = step['params']
+            return get_meals_by_criteria(self.conn, user_id, day_number=None, meal_type=params.get('meal_type'), meal_date=params.get('date'), include_recipe=False)
+        
+        # Reads are independent, so run them side by side (one cursor each)
+        if len(steps) > 1:
+            print(f"DEBUG: Fetching {len(steps)} retrieval steps concurrently")
+            results = list(self._retrieval_pool.map(fetch, steps))
         else:
-            formatted = f"No meals found for {meal_type} on {date}.\n"
-            
-        current_data = state.get('retrieved_data') or ""
-        state['retrieved_data'] = current_data + formatted
+            results = [fetch(steps[0])]
+        
+        parts = [state.get('retrieved_data') or ""]
+        for step, meals in zip(steps, results):
+            if meals:
+                parts.extend(
+                    RETRIEVED_MEAL_TEMPLATE.format(
+                        meal_type=m['meal_type'].title(),
+                        meal_date=m['meal_date'],
+                        meal_name=m['meal_name'],
+                        calories=m['nutrition']['calories'],
+                        protein_g=m['nutrition']['protein_g'],
+                        ingredients=', '.join(i['ingredient'] for i in m['ingredients_with_quantities'])
+                    )
+                    for m in meals
+                )
+            else:
+                parts.append(f"No meals found for {step['params'].get('meal_type')} on {step['params'].get('date')}.\n")
         
-        return state
+        # Planner resumes after the last step handled here
+        return {'retrieved_data': "".join(parts), 'current_step_index': last}
 
-    def node_provide_recipe(self, state: ChatRouterState) -> ChatRouterState:
+    def node_provide_recipe(self, state: ChatRouterState) -> Dict[str, Any]:
         """Execute recipe lookup step"""
         idx = state['current_step_index']
         step = state['plan'][idx]
@@ -478,17 +839,17 @@ class MealRouterAgent:
             state.get('inventory_summary')
         )
         
-        state['recipe_result'] = recipe_text
-        return state
+        return {'recipe_result': recipe_text}
 
-    def node_estimate_calories(self, state: ChatRouterState) -> ChatRouterState:
+    def node_estimate_calories(self, state: ChatRouterState) -> Dict[str, Any]:
         """Prepare messages for calorie estimation"""
-        state['active_node'] = 'calorie_estimation'
-        
-        # Clear unrelated state to prevent pollution
-        state['recipe_result'] = None
-        state['adjustment_result'] = None
-        state['retrieved_data'] = None
+        updates = {
+            'active_node': 'calorie_estimation',
+            # Clear unrelated state to prevent pollution
+            'recipe_result': None,
+            'adjustment_result': None,
+            'retrieved_data': None
+        }
         
         # Get resolved query from planner if available
         idx = state.get('current_step_index', 0)
@@ -502,70 +863,25 @@ class MealRouterAgent:
         
         print(f"DEBUG: node_estimate_calories - Query: '{query_input}'")
         
-        system_prompt = f"""You are an expert nutritionist and calorie estimator. 
-The user will describe a meal (e.g., from a buffet, restaurant, or home cooking).
-
-TOOLS AVAILABLE:
-1. search_foods(query: str): Search for nutritional information about specific foods. Use this when you need to know calories, macros, or ingredients for a food item that is not in the context.
-
-INSTRUCTIONS:
-- Use the `search_foods` tool to retrieve nutritional information. Without Exception use this, At maximum, you can use this tool 20 times.
-- IF you have already received tool outputs containing the necessary information, DO NOT call the tool again. Proceed to generate the final response.
-- **COMPOSITE DISHES (e.g., "Paneer Burji", "Chicken Sandwich"):**
-  - Do NOT just search for the full dish name.
-  - BREAK IT DOWN into main ingredients.
-  - Call `search_foods` for EACH main ingredient separately.
-  - Example: For "Paneer Burji", search for "paneer", "onion", "tomato", "ghee".
-  - Example: For "Chicken Sandwich", search for "bread", "chicken breast", "lettuce", "mayonnaise".
-- **SIMPLE FOODS (e.g., "Apple", "Egg"):**
-  - Search for the item directly.
-- FORMAT: {{"tool": "search_foods", "query": "ingredient_name"}}
-- You can output MULTIPLE tool calls in one response.
-- Do NOT output any text before the tool calls.
-- Do NOT output anything else if you are calling tools.
-
-- HANDLING SEARCH RESULTS:
-  - Aggregate the nutrition from the ingredients to estimate the total for the dish.
-  - If multiple variations are returned, choose the most relevant one.
-  - Synthesize the information into a helpful response.
-
-- FINAL OUTPUT FORMAT:
-  - Do NOT mention "search_foods", "tools", "database", or "I used a tool" in your final response.
-  - Present the information naturally as if you already knew it.
-  - Show the breakdown of ingredients if applicable.
-- Analyze the food items described.
-- Estimate portion sizes if not specified.
-- Calculate the approximate Calories and Macronutrients.
-- Provide a clear breakdown.
-- Offer a brief, non-judgmental health tip.
-
-Format the output using Markdown:
-- Use bold for totals.
-- Use a list for the breakdown.
-"""
         
         # Add tool outputs to history
         tool_outputs = state.get('tool_outputs', [])
-        messages = [SystemMessage(content=system_prompt)]
+        messages = [ESTIMATION_SYSTEM_MESSAGE]
         
-
-                
-        if tool_outputs:
-            for output in tool_outputs:
-                messages.append(AIMessage(content=f"Tool Output: {output['result']}"))
+        messages.extend(AIMessage(content=f"Tool Output: {output['result']}") for output in tool_outputs)
                 
         messages.append(HumanMessage(content=query_input))
         
-        response = self.chat_model.invoke(messages)
+        response = self._invoke_fast(messages)
         content = response.content.strip()
         
         # Check for tool calls (support multiple)
         found_tools = []
         try:
-            candidates = re.finditer(r'\{[^{}]*\}', content)
+            candidates = TOOL_CALL_RE.finditer(content)
             for match in candidates:
                 try:
-                    tool_call = json.loads(match.group(0))
+                    tool_call = fast_json.loads(match.group(0))
                     if tool_call.get("tool") == "search_foods":
                         found_tools.append(tool_call)
                 except:
@@ -574,16 +890,15 @@ Format the output using Markdown:
             pass
             
         if found_tools:
-            state['tool_calls'] = found_tools
-            return state
+            updates['tool_calls'] = found_tools
+            return updates
                 
-        state['tool_calls'] = []
-        state['final_messages'] = [response]
-        return state
+        updates['tool_calls'] = []
+        updates['final_messages'] = [response]
+        return updates
 
-    def node_general_chat(self, state: ChatRouterState) -> ChatRouterState:
+    def node_general_chat(self, state: ChatRouterState) -> Dict[str, Any]:
         """Handle general conversation with full context"""
-        state['active_node'] = 'general_chat'
         idx = state['current_step_index']
         # If called from planner, use query param, else user_input
         if state.get('plan') and idx < len(state['plan']):
@@ -598,15 +913,16 @@ Format the output using Markdown:
         history = state.get('chat_history', [])
         preferences = state.get('user_preferences', {})
         
-        # Format preferences for prompt
-        pref_text = self.feedback_agent.format_preferences_for_prompt(preferences)
+        # Format preferences for prompt (already done when they were cached)
+        cached = self._pref_cache.get(state['user_id'])
+        if cached and cached[1] is preferences:
+            pref_text = cached[2]
+        else:
+            pref_text = self.feedback_agent.format_preferences_for_prompt(preferences)
         
-        from datetime import datetime
-        current_date_str = datetime.now().strftime('%A, %B %d, %Y')
+        current_date_str = state['request_today_str']
         
-        system_prompt = f"""You are Meal Mind AI, a helpful nutrition and meal planning assistant.
-
-TODAY'S DATE: {current_date_str}
+        context_block = f"""TODAY'S DATE: {current_date_str}
 
 USER PROFILE:
 - Name: {user_profile.get('username', 'User')}
@@ -632,55 +948,32 @@ CURRENT INVENTORY:
 MEAL PLAN SUMMARY:
 {meal_plan[:300]}...
 
-TOOLS AVAILABLE:
-1. search_foods(query: str): Search for nutritional information about specific foods. Use this when you need to know calories, macros, or ingredients for a food item that is not in the context.
-
-INSTRUCTIONS:
-- Use the `search_foods` tool to verify nutritional claims or get specific data from the database.
-- FORMAT: {{"tool": "search_foods", "query": "apple pie"}}
-- Do NOT output anything else if you are calling a tool.
-- If you have enough information (or after tool use), answer the user directly.
-- HANDLING SEARCH RESULTS:
-  - If multiple variations are returned (e.g., raw, boiled, fried), choose the most relevant one based on the user's description.
-  - If the user didn't specify preparation, present the most common form (e.g., "cooked" or "raw") or briefly summarize the options (e.g., "Raw: 33 kcal, Cooked: 59 kcal").
-  - Do NOT simply list the raw database records. Synthesize the information into a helpful response.
-- FINAL OUTPUT FORMAT:
-  - Do NOT mention "search_foods", "tools", "database", or "I used a tool" in your final response.
-  - Present the information naturally as if you already knew it.
-- Provide nutrition advice and cooking tips considering user preferences
-- Answer health and wellness questions
-- Be encouraging and supportive
-- Keep responses concise and helpful
-- IMPORTANT: Respect user dislikes and preferences in your suggestions
 """
+        system_prompt = GENERAL_CHAT_SYSTEM_PROMPT + "\n" + context_block
         
         # Prepare messages
         messages = [SystemMessage(content=system_prompt)]
         
         # Add history (last 5 messages)
-        recent_history = history[-5:]
-        for msg in recent_history:
-             messages.append(msg)
+        messages.extend(history[-5:])
              
         # Add tool outputs
         tool_outputs = state.get('tool_outputs', [])
-        if tool_outputs:
-            for output in tool_outputs:
-                messages.append(AIMessage(content=f"Tool Output: {output['result']}"))
+        messages.extend(AIMessage(content=f"Tool Output: {output['result']}") for output in tool_outputs)
         
         # Add current query
         messages.append(HumanMessage(content=query))
         
-        response = self.chat_model.invoke(messages)
+        response = self._invoke_fast(messages)
         content = response.content.strip()
         
         # Check for tool calls (support multiple)
         found_tools = []
         try:
-            candidates = re.finditer(r'\{[^{}]*\}', content)
+            candidates = TOOL_CALL_RE.finditer(content)
             for match in candidates:
                 try:
-                    tool_call = json.loads(match.group(0))
+                    tool_call = fast_json.loads(match.group(0))
                     if tool_call.get("tool") == "search_foods":
                         print(f"\n*** TOOL CALL DETECTED (General Chat): {tool_call} ***\n")
                         found_tools.append(tool_call)
@@ -690,14 +983,11 @@ INSTRUCTIONS:
             pass
             
         if found_tools:
-            state['tool_calls'] = found_tools
-            return state
+            return {'active_node': 'general_chat', 'tool_calls': found_tools}
             
-        state['tool_calls'] = []
-        state['final_messages'] = [response]
-        return state
+        return {'active_node': 'general_chat', 'tool_calls': [], 'final_messages': [response]}
 
-    def node_execute_tools(self, state: ChatRouterState) -> ChatRouterState:
+    def node_execute_tools(self, state: ChatRouterState) -> Dict[str, Any]:
         """Execute pending tool calls"""
         tool_calls = state.get('tool_calls', [])
         current_outputs = state.get('tool_outputs', [])
@@ -730,42 +1020,51 @@ INSTRUCTIONS:
                 executed_queries.add(('search_foods', query))
         
         # Append to existing outputs if we are looping
-        state['tool_outputs'] = current_outputs + outputs
-        state['tool_calls'] = [] # Clear calls
-        return state
+        return {
+            'tool_outputs': current_outputs + outputs,
+            'tool_calls': []  # Clear calls
+        }
 
-    def node_generate_response(self, state: ChatRouterState) -> ChatRouterState:
-        response_text = ""
+    def _collect_monitoring_warnings(self, turn_id: str) -> List[str]:
+        """Wait (bounded) for the health check this turn's node_adjust_meal started"""
+        future = self._monitor_futures.pop(turn_id, None)
+        if future is None:
+            return []
+        try:
+            return future.result(timeout=MONITOR_TIMEOUT_SECONDS)
+        except TimeoutError:
+            print(f"DEBUG: Health monitoring still running after {MONITOR_TIMEOUT_SECONDS}s, replying without it")
+            return []
+        except Exception as e:
+            print(f"ERROR: Health monitoring did not complete: {e}")
+            return []
+
+    def node_generate_response(self, state: ChatRouterState) -> Dict[str, Any]:
+        parts = []
+        monitoring_warnings = self._collect_monitoring_warnings(state['turn_id'])
         
         # 1. Adjustments
         if state.get('adjustment_result'):
             res = state['adjustment_result']
-            response_text += f"{res['message']}\n\n"
+            parts.append(f"{res['message']}\n\n")
             if 'new_daily_total' in res:
-                totals = res['new_daily_total']
-                response_text += "**New Daily Total:**\n"
-                response_text += f"- Calories: {totals['calories']} kcal\n"
-                response_text += f"- Protein: {totals['protein_g']}g\n"
-                response_text += f"- Carbs: {totals['carbohydrates_g']}g\n"
-                response_text += f"- Fat: {totals['fat_g']}g\n"
-                response_text += f"- Fiber: {totals['fiber_g']}g\n"
+                parts.append(DAILY_TOTAL_TEMPLATE.format(**res['new_daily_total']))
             
-            if state.get('monitoring_warnings'):
-                response_text += "\n**Health Alerts:**\n"
-                for w in state['monitoring_warnings']:
-                    response_text += f"{w}\n"
+            if monitoring_warnings:
+                parts.append("\n**Health Alerts:**\n")
+                parts.extend(f"{w}\n" for w in monitoring_warnings)
                     
         # 2. Retrieval
         if state.get('retrieved_data'):
-            response_text += "\n**Retrieved Meals:**\n" + state['retrieved_data']
+            parts.extend(["\n**Retrieved Meals:**\n", state['retrieved_data']])
             
         # 3. Recipe
         if state.get('recipe_result'):
-            response_text += "\n" + state['recipe_result']
+            parts.extend(["\n", state['recipe_result']])
 
         # 4. General Chat
         if state.get('final_messages'):
-            response_text += "\n" + state['final_messages'][0].content
+            parts.extend(["\n", state['final_messages'][0].content])
             
             # If this was a calorie estimation (which uses general_chat node logic but sets active_node),
             # we might want to ask if they want to add it.
@@ -773,18 +1072,27 @@ INSTRUCTIONS:
             # The result of `node_estimate_calories` is in `final_messages` because it uses `chat_model.invoke`.
             
             if state.get('active_node') == 'calorie_estimation':
-                 response_text += "\n\nWould you like to add this to your meal plan? If so, please confirm."
+                 parts.append("\n\nWould you like to add this to your meal plan? If so, please confirm.")
 
-        if not response_text:
-            response_text = "I processed your request."
+        response_text = "".join(parts) or "I processed your request."
             
-        state['response'] = response_text
-        return state
+        return {'response': response_text, 'monitoring_warnings': monitoring_warnings}
 
     # ==================== RUN METHODS ====================
     def run_chat_stream(self, user_input: str, user_id: str, history: List[Any], context_data: Dict, user_preferences: Dict = None, thread_id: str = None):
         """Stream the chat response with status updates"""
         
+        request_date = datetime.now().strftime('%Y-%m-%d')
+        quick_plan = fast_plan(user_input, request_date)
+        response_key = None
+        if quick_plan and all(step['action'] in CACHEABLE_ACTIONS for step in quick_plan):
+            response_key = (user_id, request_date, " ".join(user_input.lower().split()))
+        cached_reply = self._cache_lookup(self._response_cache, response_key, RESPONSE_CACHE_TTL_SECONDS) if response_key else None
+        if cached_reply:
+            print(f"DEBUG: Reusing cached reply for '{user_input}'")
+            yield cached_reply
+            return
+        
         initial_state = {
             "user_input": user_input,
             "user_id": user_id,
@@ -792,6 +1100,7 @@ INSTRUCTIONS:
             "inventory_summary": context_data.get('inventory_summary', ''),
             "meal_plan_summary": context_data.get('meal_plan_summary', ''),
             "chat_history": history,
+            "user_preferences": user_preferences or {},
             "plan": [],
             "current_step_index": 0,
             "retrieved_data": None,
@@ -805,28 +1114,39 @@ INSTRUCTIONS:
             "active_node": ""
         }
         
-        config = {"configurable": {"thread_id": thread_id}} if thread_id else None
+        if thread_id:
+            app = self.app
+            config = {"configurable": {"thread_id": thread_id}}
+        else:
+            app = self.stateless_app
+            config = None
         
         final_response = ""
+        last_status = None
         
-        for output in self.app.stream(initial_state, config=config):
-            for key, value in output.items():
-                if key == "load_preferences":
-                    yield "__STATUS__: Loading your preferences..."
-                elif key == "extract_feedback":
-                    yield "__STATUS__: Learning from your feedback..."
-                elif key == "planner":
-                    yield "__STATUS__: Planning actions..."
-                elif key == "meal_adjustment":
-                    yield "__STATUS__: Adjusting meal..."
-                elif key == "meal_retrieval":
-                    yield "__STATUS__: Retrieving data..."
-                elif key == "execute_tools":
-                    yield "__STATUS__: Searching database..."
-                elif key == "generate_response":
-                    if value.get('response'):
-                        final_response = value['response']
-                        yield final_response
+        # durability="exit": checkpoint only the finished turn, not every node transition
+        for mode, output in app.stream(initial_state, config=config, stream_mode=["updates", "custom"], durability="exit"):
+            if mode == "custom":
+                # Per-step statuses written from inside execute_plan
+                status = output.get('status')
+            else:
+                status = None
+                for key, value in output.items():
+                    if key == "generate_response":
+                        if value.get('response'):
+                            final_response = value['response']
+                            yield final_response
+                        continue
+                    status = NODE_STATUS.get(key, status)
+            
+            # Only emit a status when it actually changes
+            if status and status != last_status:
+                last_status = status
+                yield f"__STATUS__: {status}"
                         
         if not final_response:
              yield "I completed the task but have no output."
+        elif response_key:
+            self._cache_store(self._response_cache, response_key, final_response, RESPONSE_CACHE_SIZE)
+        
+        self.submit_feedback_extraction(user_input, user_id)
@@ -1,6 +1,6 @@
 import streamlit as st
 from utils.api import get_nutrition_info_from_api, parse_macro_value, calculate_manual, calculate_nutrition_targets, get_bmi_category
-from utils.helpers import add_inventory_item, generate_comprehensive_meal_plan_prompt, save_meal_plan
+from utils.helpers import add_inventory_items, generate_comprehensive_meal_plan_prompt, save_meal_plan
 from utils.agent import MealPlanAgentWithExtraction, MealPlanState
 from utils.db import get_snowpark_session
 import pandas as pd
@@ -404,9 +404,10 @@ def profile_setup_wizard(conn, user_id):
                                        ))
 
                         # Save inventory
-                        for item in st.session_state.inventory_items:
-                            add_inventory_item(conn, user_id, item['name'],
-                                               item['quantity'], item['unit'], item['category'])
+                        add_inventory_items(conn, user_id, [
+                            (item['name'], item['quantity'], item['unit'], item['category'])
+                            for item in st.session_state.inventory_items
+                        ])
 
                         conn.commit()
 
@@ -1,9 +1,14 @@
 import streamlit as st
 import json
+from collections import OrderedDict
 
-def apply_custom_css():
-    """Apply custom CSS styles with a premium, modern aesthetic"""
-    st.markdown("""
+try:
+    import orjson as fast_json  # Optional: faster parsing of stored meal JSON
+except ImportError:
+    fast_json = json
+
+# Global stylesheet; a plain constant so it is built once at import
+CUSTOM_CSS = """
     <link rel="preconnect" href="https://fonts.googleapis.com">
     <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
     <link href="https://fonts.googleapis.com/css2?family=Outfit:wght@300;400;500;600;700&family=Inter:wght@400;500;600&display=swap" rel="stylesheet">
@@ -236,12 +241,72 @@ def apply_custom_css():
             color: var(--text-primary);
         }
     </style>
-    """, unsafe_allow_html=True)
+"""
+
+
+def apply_custom_css():
+    """Apply custom CSS styles with a premium, modern aesthetic"""
+    # Emitted on every rerun on purpose: Streamlit drops elements a rerun does not render again,
+    # so a once-per-session guard would strip the styles after the first interaction
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+
+def parse_json_field(value, default=None):
+    """Return a JSON column as Python data, parsing only when it is still a string"""
+    if not value:
+        return default
+    if isinstance(value, (str, bytes)):
+        return fast_json.loads(value)
+    return value
+
+
+def cached_json_field(cache_name, key, raw, default=None):
+    """Parse a stored JSON value once per session, re-parsing only when the raw value changes"""
+    cache = st.session_state.setdefault(cache_name, {})
+    cached = cache.get(key)
+    if cached is not None and cached[0] == raw:
+        return cached[1]
+    parsed = parse_json_field(raw, default)
+    cache[key] = (raw, parsed)
+    return parsed
+
+
+# Parsed meals kept per session, least recently shown first
+MEAL_CACHE_SIZE = 64
+
+
+def _parse_meal(meal_data):
+    """Parse a meal's JSON columns once and reuse them across dialog reruns"""
+    cache = st.session_state.setdefault("_parsed_meal_cache", OrderedDict())
+    key = (meal_data.get('meal_id'), meal_data.get('day_number'), meal_data.get('meal_type'), meal_data['meal_name'])
+    # Edits that keep the meal name still change these columns, so they must match too
+    raw = (meal_data.get('nutrition'), meal_data.get('ingredients_with_quantities'), meal_data.get('recipe'))
+    cached = cache.get(key)
+    if cached is not None and cached[0] == raw:
+        cache.move_to_end(key)
+        return cached[1]
+
+    nutrition = parse_json_field(meal_data.get('nutrition'), {})
+    parsed = {
+        "nutrition_html": "".join(
+            f"<span class='nutrition-badge'>{name.replace('_g', '').replace('_', ' ').title()}: "
+            f"{value:.1f}{'g' if '_g' in name else ''}</span>"
+            for name, value in nutrition.items()
+        ),
+        "ingredients": parse_json_field(meal_data.get('ingredients_with_quantities'), []),
+        "recipe": parse_json_field(meal_data.get('recipe'), {}),
+    }
+    cache[key] = (raw, parsed)
+    cache.move_to_end(key)
+    if len(cache) > MEAL_CACHE_SIZE:
+        cache.popitem(last=False)
+    return parsed
 
 
 @st.dialog("🍽️ Meal Details")
 def show_meal_details(meal_data):
     """Show meal details in a dialog"""
+    parsed = _parse_meal(meal_data)
     st.subheader(meal_data['meal_name'])
     
     # Quick stats
@@ -255,33 +320,26 @@ def show_meal_details(meal_data):
     stat_cols[3].metric("Level", f"{difficulty_colors.get(level, '⚪')} {level}")
 
     # Nutrition
-    if meal_data['nutrition']:
-        nutrition = json.loads(meal_data['nutrition']) if isinstance(meal_data['nutrition'], str) else meal_data['nutrition']
+    if parsed['nutrition_html']:
         st.markdown("**Nutrition:**")
-        nutrition_html = ""
-        for key, value in nutrition.items():
-            label = key.replace('_g', '').replace('_', ' ').title()
-            nutrition_html += f"<span class='nutrition-badge'>{label}: {value:.1f}{'g' if '_g' in key else ''}</span>"
-        st.markdown(nutrition_html, unsafe_allow_html=True)
+        st.markdown(parsed['nutrition_html'], unsafe_allow_html=True)
 
     # Ingredients
-    if meal_data['ingredients_with_quantities']:
-        ingredients = json.loads(meal_data['ingredients_with_quantities']) if isinstance(meal_data['ingredients_with_quantities'], str) else meal_data['ingredients_with_quantities']
+    ingredients = parsed['ingredients']
+    if ingredients:
         st.markdown("### 📦 Ingredients")
         for ing in ingredients:
             icon = "✅" if ing.get('from_inventory', False) else "🛒"
             st.write(f"{icon} **{ing.get('quantity', '')} {ing.get('unit', '')}** {ing.get('ingredient', '')}")
 
     # Recipe
-    if meal_data['recipe']:
-        recipe = json.loads(meal_data['recipe']) if isinstance(meal_data['recipe'], str) else meal_data['recipe']
+    recipe = parsed['recipe']
+    if recipe:
         st.markdown("### 👨‍🍳 Full Recipe")
         
         if recipe.get('equipment_needed'):
             st.markdown("**🔧 Equipment:**")
-            equipment_html = ""
-            for item in recipe['equipment_needed']:
-                equipment_html += f"<span class='nutrition-badge'>{item}</span>"
+            equipment_html = "".join(f"<span class='nutrition-badge'>{item}</span>" for item in recipe['equipment_needed'])
             st.markdown(equipment_html, unsafe_allow_html=True)
             st.write("")
 
@@ -1,17 +1,14 @@
 import streamlit as st
 from utils.meal_router_agent import MealRouterAgent
-from utils.db import get_user_profile, get_user_inventory, get_latest_meal_plan, get_snowpark_session
+from utils.db import get_user_profile, get_user_inventory, get_latest_meal_plan, get_snowpark_session, clear_dashboard_caches
 from utils.thread_manager import ThreadManager
 from utils.feedback_agent import FeedbackAgent
+from utils.helpers import invalidate_user_context
 from langchain.schema import HumanMessage, AIMessage
 import time
 
-@st.fragment
-def render_chat(conn, user_id):
-    """Render the enhanced chat interface with intelligent routing"""
-    
-    # Custom CSS for better chat layout
-    st.markdown("""
+# Chat layout styles
+CHAT_CSS = """
         <style>
         /* Chat container */
         .stChatMessage {
@@ -42,7 +39,53 @@ def render_chat(conn, user_id):
             margin-bottom: 0.5rem !important;
         }
         </style>
-    """, unsafe_allow_html=True)
+    """
+
+@st.fragment
+def render_chat_history(user_id):
+    """Render the stored conversation with feedback buttons"""
+    # Display chat messages
+    for i, msg in enumerate(st.session_state.messages):
+        if isinstance(msg, HumanMessage):
+            with st.chat_message("user", avatar="👤"):
+                st.markdown(msg.content)
+        elif isinstance(msg, AIMessage):
+            with st.chat_message("assistant", avatar="🤖"):
+                st.markdown(msg.content)
+                
+                # Add feedback buttons (only for AI messages, not the welcome message)
+                if i > 0:  # Skip welcome message
+                    col1, col2, col3 = st.columns([0.1, 0.1, 0.8])
+                    with col1:
+                        if st.button("👍", key=f"like_{i}", help="I like this response"):
+                            st.session_state.feedback_agent.save_explicit_feedback(
+                                user_id=user_id,
+                                entity_id=f"msg_{i}",
+                                entity_name=f"Response about: {st.session_state.messages[i-1].content[:30]}...",
+                                entity_type="ai_response",
+                                feedback="like"
+                            )
+                            st.session_state.chat_agent.invalidate_preferences(user_id)
+                            st.success("Thanks for the feedback!")
+                    with col2:
+                        if st.button("👎", key=f"dislike_{i}", help="I don't like this response"):
+                            st.session_state.feedback_agent.save_explicit_feedback(
+                                user_id=user_id,
+                                entity_id=f"msg_{i}",
+                                entity_name=f"Response about: {st.session_state.messages[i-1].content[:30]}...",
+                                entity_type="ai_response",
+                                feedback="dislike"
+                            )
+                            st.session_state.chat_agent.invalidate_preferences(user_id)
+                            st.warning("Thanks for the feedback! We'll improve.")
+
+
+@st.fragment
+def render_chat(conn, user_id):
+    """Render the enhanced chat interface with intelligent routing"""
+    
+    # Custom CSS for better chat layout (re-sent each rerun; Streamlit drops elements a rerun skips)
+    st.markdown(CHAT_CSS, unsafe_allow_html=True)
     
     # Thread Management
     thread_mgr = ThreadManager(conn)
@@ -112,6 +155,7 @@ def render_chat(conn, user_id):
             get_user_profile.clear()
             get_user_inventory.clear()
             get_latest_meal_plan.clear()
+            clear_dashboard_caches()
             
             # Also clear meal plan view caches so updates (like adding food) show up there
             from utils.db import get_daily_meals_for_plan, get_weekly_meal_details
@@ -193,7 +237,11 @@ def render_chat(conn, user_id):
             
             # Format inventory summary
             if not inventory_df.empty:
-                inv_summary = inventory_df.head(20).to_string()
+                # Compact "item: qty unit" list; far fewer prompt tokens than a padded table
+                inv_summary = ", ".join(
+                    f"{item}: {qty} {unit}"
+                    for item, qty, unit in inventory_df[['Item', 'Qty', 'Unit']].head(20).itertuples(index=False)
+                )
             else:
                 inv_summary = "Inventory is empty."
             
@@ -231,38 +279,8 @@ def render_chat(conn, user_id):
     message_container = st.container(height=500)
     
     with message_container:
-        # Display chat messages
-        for i, msg in enumerate(st.session_state.messages):
-            if isinstance(msg, HumanMessage):
-                with st.chat_message("user", avatar="👤"):
-                    st.markdown(msg.content)
-            elif isinstance(msg, AIMessage):
-                with st.chat_message("assistant", avatar="🤖"):
-                    st.markdown(msg.content)
-                    
-                    # Add feedback buttons (only for AI messages, not the welcome message)
-                    if i > 0:  # Skip welcome message
-                        col1, col2, col3 = st.columns([0.1, 0.1, 0.8])
-                        with col1:
-                            if st.button("👍", key=f"like_{i}", help="I like this response"):
-                                st.session_state.feedback_agent.save_explicit_feedback(
-                                    user_id=user_id,
-                                    entity_id=f"msg_{i}",
-                                    entity_name=f"Response about: {st.session_state.messages[i-1].content[:30]}...",
-                                    entity_type="ai_response",
-                                    feedback="like"
-                                )
-                                st.success("Thanks for the feedback!")
-                        with col2:
-                            if st.button("👎", key=f"dislike_{i}", help="I don't like this response"):
-                                st.session_state.feedback_agent.save_explicit_feedback(
-                                    user_id=user_id,
-                                    entity_id=f"msg_{i}",
-                                    entity_name=f"Response about: {st.session_state.messages[i-1].content[:30]}...",
-                                    entity_type="ai_response",
-                                    feedback="dislike"
-                                )
-                                st.warning("Thanks for the feedback! We'll improve.")
+        # Own fragment: feedback clicks rerun only the history, not the whole chat view
+        render_chat_history(user_id)
 
     # Chat Input
     if prompt := st.chat_input("What would you like to know?", key="chat_input"):
@@ -294,35 +312,37 @@ def render_chat(conn, user_id):
         try:
             with message_container:
                 with st.chat_message("assistant", avatar="🤖"):
-                    message_placeholder = st.empty()
-                    message_placeholder.markdown("Thinking...")
-                    full_response = ""
+                    status_placeholder = st.empty()
+                    status_placeholder.markdown("Thinking...")
                     
-                    # Stream the response
-                    # Pass thread_id for checkpointer
-                    for chunk in st.session_state.chat_agent.run_chat_stream(
-                        user_input=prompt,
-                        user_id=user_id,
-                        history=st.session_state.messages[:-1],
-                        context_data=st.session_state.chat_context_cache,
-                        user_preferences=st.session_state.user_preferences_cache,
-                        thread_id=st.session_state.current_thread_id
-                    ):
-                        if chunk.startswith("__STATUS__:"):
-                            status_msg = chunk.replace("__STATUS__: ", "")
-                            message_placeholder.markdown(f"*{status_msg}*")
-                            # No sleep here for speed
-                        else:
-                            full_response += chunk
-                            message_placeholder.markdown(full_response + "▌")
-                            # No sleep here for speed
+                    def reply_chunks():
+                        """Show status updates in the placeholder and pass reply text through"""
+                        # Pass thread_id for checkpointer
+                        for chunk in st.session_state.chat_agent.run_chat_stream(
+                            user_input=prompt,
+                            user_id=user_id,
+                            history=st.session_state.messages[:-1],
+                            context_data=st.session_state.chat_context_cache,
+                            user_preferences=st.session_state.user_preferences_cache,
+                            thread_id=st.session_state.current_thread_id
+                        ):
+                            if chunk.startswith("__STATUS__:"):
+                                status_msg = chunk.replace("__STATUS__: ", "")
+                                status_placeholder.markdown(f"*{status_msg}*")
+                            else:
+                                status_placeholder.empty()
+                                yield chunk
                     
-                    # Final response without cursor
-                    message_placeholder.markdown(full_response)
+                    # Streamlit batches the repaints and returns the joined text
+                    full_response = st.write_stream(reply_chunks())
             
             # Add assistant response to state
             st.session_state.messages.append(AIMessage(content=full_response))
             
+            # Meal edits made by this turn must show up on the other pages
+            if st.session_state.chat_agent.pop_meal_plan_change(user_id):
+                invalidate_user_context()
+            
             # Persist assistant message to database
             thread_mgr.add_message(
                 thread_id=st.session_state.current_thread_id,
@@ -1,91 +1,7 @@
 import streamlit as st
-import pandas as pd
-import json
 from datetime import datetime, timedelta
 from utils.api import get_bmi_category
-
-def get_weekly_nutrition_history(conn, user_id, num_weeks=4):
-    """Fetch nutrition data for the past N weeks"""
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            SELECT 
-                mp.start_date,
-                mp.end_date,
-                dm.meal_date,
-                dm.total_nutrition
-            FROM daily_meals dm
-            JOIN meal_plans mp ON dm.plan_id = mp.plan_id
-            WHERE dm.user_id = %s
-            AND dm.meal_date >= DATEADD(week, -%s, CURRENT_DATE())
-            ORDER BY dm.meal_date DESC
-        """, (user_id, num_weeks))
-        
-        rows = cursor.fetchall()
-        data = []
-        for row in rows:
-            nutrition = row[3]
-            if isinstance(nutrition, str):
-                try:
-                    nutrition = json.loads(nutrition)
-                except:
-                    nutrition = {}
-            elif nutrition is None:
-                nutrition = {}
-            
-            data.append({
-                'date': row[2],
-                'calories': nutrition.get('calories', 0),
-                'protein': nutrition.get('protein_g', 0),
-                'carbs': nutrition.get('carbohydrates_g', 0),
-                'fat': nutrition.get('fat_g', 0),
-                'fiber': nutrition.get('fiber_g', 0)
-            })
-        
-        return pd.DataFrame(data)
-    except Exception as e:
-        return pd.DataFrame()
-    finally:
-        cursor.close()
-
-def get_weekly_averages(conn, user_id):
-    """Get average nutrition per week for comparison"""
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            SELECT 
-                DATE_TRUNC('week', dm.meal_date) as week_start,
-                AVG(PARSE_JSON(dm.total_nutrition):calories::FLOAT) as avg_calories,
-                AVG(PARSE_JSON(dm.total_nutrition):protein_g::FLOAT) as avg_protein,
-                AVG(PARSE_JSON(dm.total_nutrition):carbohydrates_g::FLOAT) as avg_carbs,
-                AVG(PARSE_JSON(dm.total_nutrition):fat_g::FLOAT) as avg_fat,
-                AVG(PARSE_JSON(dm.total_nutrition):fiber_g::FLOAT) as avg_fiber
-            FROM daily_meals dm
-            JOIN meal_plans mp ON dm.plan_id = mp.plan_id
-            WHERE dm.user_id = %s
-            AND dm.meal_date >= DATEADD(week, -4, CURRENT_DATE())
-            GROUP BY DATE_TRUNC('week', dm.meal_date)
-            ORDER BY week_start DESC
-            LIMIT 4
-        """, (user_id,))
-        
-        rows = cursor.fetchall()
-        data = []
-        for row in rows:
-            data.append({
-                'week': row[0].strftime('%b %d') if row[0] else 'Unknown',
-                'calories': float(row[1] or 0),
-                'protein': float(row[2] or 0),
-                'carbs': float(row[3] or 0),
-                'fat': float(row[4] or 0),
-                'fiber': float(row[5] or 0)
-            })
-        
-        return pd.DataFrame(data)
-    except Exception as e:
-        return pd.DataFrame()
-    finally:
-        cursor.close()
+from utils.db import get_weekly_nutrition_history, get_weekly_averages, get_plan_count
 
 def render_dashboard(conn, user_id):
     st.header("📊 Nutrition Dashboard")
@@ -123,19 +39,7 @@ def render_dashboard(conn, user_id):
         daily_df = get_weekly_nutrition_history(conn, user_id)
         
         # Count distinct meal plans to determine if we have enough data for comparison
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                SELECT COUNT(DISTINCT mp.plan_id) 
-                FROM meal_plans mp
-                WHERE mp.user_id = %s
-                AND mp.status IN ('ACTIVE', 'COMPLETED')
-            """, (user_id,))
-            plan_count = cursor.fetchone()[0]
-        except:
-            plan_count = 0
-        finally:
-            cursor.close()
+        plan_count = get_plan_count(conn, user_id)
         
         if not weekly_df.empty and plan_count >= 2:
             # Charts side by side
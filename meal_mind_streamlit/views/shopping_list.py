@@ -1,18 +1,30 @@
 import streamlit as st
-import json
+import pandas as pd
+from utils.ui import cached_json_field
+
+# (heading, shopping_data key) in display order
+SHOPPING_CATEGORIES = (
+    ("Proteins", "proteins"),
+    ("Grains", "grains"),
+    ("Vegetables", "vegetables"),
+    ("Fruits", "fruits"),
+    ("Dairy/Alt", "dairy_alternatives"),
+    ("Pantry", "pantry_items"),
+)
 
 def render_shopping_list(conn, user_id):
     """View shopping list for active plan"""
     st.header("🛒 Shopping List")
     
-    from utils.db import get_meal_plan_history
+    from utils.db import get_shopping_list_history
     
-    # History Selection
+    # History Selection (plans and their shopping lists come back together)
     col_hist1, col_hist2 = st.columns([0.7, 0.3])
+    history = get_shopping_list_history(conn, user_id)
+    plans = {p['plan_id']: p for p in history}
     selected_plan_id = None
     
     with col_hist2:
-        history = get_meal_plan_history(conn, user_id)
         if history:
             # Format options for dropdown
             plan_options = {p['plan_id']: f"{p['start_date'].strftime('%b %d')} - {p['end_date'].strftime('%b %d')}" for p in history}
@@ -28,36 +40,13 @@ def render_shopping_list(conn, user_id):
                 key="sl_history_selector"
             )
     
-    cursor = conn.cursor()
-    
-    if selected_plan_id:
-        # Fetch specific plan
-        cursor.execute("""
-                       SELECT s.shopping_data, p.plan_name
-                       FROM shopping_lists s
-                       JOIN meal_plans p ON s.plan_id = p.plan_id
-                       WHERE s.user_id = %s AND p.plan_id = %s
-                       ORDER BY s.created_at DESC LIMIT 1
-                       """, (user_id, selected_plan_id))
-    else:
-        # Default to active
-        cursor.execute("""
-                       SELECT s.shopping_data, p.plan_name
-                       FROM shopping_lists s
-                       JOIN meal_plans p ON s.plan_id = p.plan_id
-                       WHERE s.user_id = %s AND p.status = 'ACTIVE'
-                       ORDER BY s.created_at DESC LIMIT 1
-                       """, (user_id,))
-                       
-    result = cursor.fetchone()
-    cursor.close()
-
-    if not result:
+    selected = plans.get(selected_plan_id)
+    if not selected or not selected['shopping_data']:
         st.info("No active shopping list found. Generate a meal plan first!")
         return
 
-    shopping_data = json.loads(result[0])
-    plan_name = result[1]
+    shopping_data = cached_json_field("_shopping_list_cache", selected_plan_id, selected['shopping_data'], {})
+    plan_name = selected['plan_name']
     
     st.caption(f"For: {plan_name}")
 
@@ -65,23 +54,14 @@ def render_shopping_list(conn, user_id):
         st.success("🎉 Nothing to buy! You have everything in stock.")
         return
 
-    # Display by category
-    categories = {
-        "Proteins": shopping_data.get('proteins', []),
-        "Grains": shopping_data.get('grains', []),
-        "Vegetables": shopping_data.get('vegetables', []),
-        "Fruits": shopping_data.get('fruits', []),
-        "Dairy/Alt": shopping_data.get('dairy_alternatives', []),
-        "Pantry": shopping_data.get('pantry_items', [])
-    }
-
-    for cat, items in categories.items():
-        if items:
-            st.subheader(cat)
-            for item in items:
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.write(f"**{item['item']}**")
-                with col2:
-                    st.write(f"{item['quantity_to_purchase']} {item['unit']}")
-            st.divider()
+    # Display by category, one table each instead of a row of widgets per item
+    for cat, key in SHOPPING_CATEGORIES:
+        items = shopping_data.get(key)
+        if not items:
+            continue
+        st.subheader(cat)
+        table = pd.DataFrame({
+            "Item": [item['item'] for item in items],
+            "Quantity": [f"{item['quantity_to_purchase']} {item['unit']}" for item in items]
+        })
+        st.dataframe(table, hide_index=True, use_container_width=True)
@@ -1,8 +1,9 @@
 import streamlit as st
-import json
+import pandas as pd
 from utils.db import get_snowpark_session
-from utils.helpers import add_inventory_item, update_plan_suggestions
+from utils.helpers import add_inventory_items, update_plan_suggestions
 from utils.agent import MealPlanAgentWithExtraction
+from utils.ui import cached_json_field
 
 def render_suggestions(conn, user_id):
     """View suggestions for next week"""
@@ -10,21 +11,23 @@ def render_suggestions(conn, user_id):
     st.info("Items to add variety to your future meals!")
 
     cursor = conn.cursor()
-    cursor.execute("""
-                   SELECT week_summary, plan_id, plan_name
-                   FROM meal_plans
-                   WHERE user_id = %s AND status = 'ACTIVE'
-                   ORDER BY created_at DESC LIMIT 1
-                   """, (user_id,))
-    result = cursor.fetchone()
+    try:
+        cursor.execute("""
+                       SELECT week_summary, plan_id, plan_name
+                       FROM meal_plans
+                       WHERE user_id = %s AND status = 'ACTIVE'
+                       ORDER BY created_at DESC LIMIT 1
+                       """, (user_id,))
+        result = cursor.fetchone()
+    finally:
+        cursor.close()
     
     if not result:
         st.warning("Generate a meal plan to get suggestions!")
-        cursor.close()
         return
 
-    week_summary = json.loads(result[0])
     plan_id = result[1]
+    week_summary = cached_json_field("_week_summary_cache", plan_id, result[0], {})
     plan_name = result[2]
     suggestions = week_summary.get('future_suggestions', [])
     
@@ -35,17 +38,21 @@ def render_suggestions(conn, user_id):
     with col2:
         if st.button("✨ Generate Smart Suggestions", help="Generate new suggestions based on your goals"):
             with st.spinner("Analyzing your plan and goals..."):
-                # Get user profile
-                cursor.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
-                user_row = cursor.fetchone()
+                # Get user profile (only the fields the suggestion prompt uses)
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("""
+                                   SELECT health_goal, activity_level, dietary_restrictions,
+                                          food_allergies, preferred_cuisines
+                                   FROM users WHERE user_id = %s
+                                   """, (user_id,))
+                    user_row = cursor.fetchone()
+                    columns = [col[0].lower() for col in cursor.description]
+                finally:
+                    cursor.close()
                 
-                user_profile = {
-                    'health_goal': user_row[13], 
-                    'activity_level': user_row[12],
-                    'dietary_restrictions': user_row[14],
-                    'food_allergies': user_row[15],
-                    'preferred_cuisines': user_row[16] if len(user_row) > 16 else 'Any'
-                }
+                user_profile = dict(zip(columns, user_row))
+                user_profile['preferred_cuisines'] = user_profile.get('preferred_cuisines') or 'Any'
                 
                 # Get plan summary (simplified)
                 plan_summary = f"Plan: {plan_name}. Current inventory utilization: {week_summary.get('inventory_utilization_rate', 0)}%"
@@ -61,27 +68,40 @@ def render_suggestions(conn, user_id):
                         st.rerun()
                 else:
                     st.error("Could not generate suggestions. Try again.")
-    
-    cursor.close()
 
     if not suggestions:
         st.info("No suggestions available yet. Click the button above to generate them!")
         return
 
-    for i, item in enumerate(suggestions):
-        with st.container():
-            col1, col2, col3 = st.columns([2, 2, 1])
-            with col1:
-                st.write(f"**{item.get('item', 'Unknown')}**")
-                st.caption(f"Reason: {item.get('reason', '')}")
-            with col2:
-                st.write(f"Category: {item.get('category', 'General')}")
-                st.write(f"Qty: {item.get('suggested_quantity', 1)} {item.get('unit', 'unit')}")
-            with col3:
-                if st.button("➕ Add", key=f"sugg_{i}"):
-                    if add_inventory_item(conn, user_id, item.get('item'), 
-                                       item.get('suggested_quantity', 1), 
-                                       item.get('unit', 'unit'), 
-                                       item.get('category', 'Other')):
-                        st.toast(f"Added {item.get('item')} to inventory!")
-            st.divider()
+    # One editable table with an "Add" checkbox column instead of a button row per item
+    table = pd.DataFrame({
+        "Add": [False] * len(suggestions),
+        "Item": [item.get('item', 'Unknown') for item in suggestions],
+        "Category": [item.get('category', 'General') for item in suggestions],
+        "Qty": [f"{item.get('suggested_quantity', 1)} {item.get('unit', 'unit')}" for item in suggestions],
+        "Reason": [item.get('reason', '') for item in suggestions],
+    })
+    # Bumped after an add so the editor comes back with every box unchecked
+    editor_version = st.session_state.get("suggestions_editor_version", 0)
+    edited = st.data_editor(
+        table,
+        column_config={
+            "Add": st.column_config.CheckboxColumn("Add", width="small"),
+            "Reason": st.column_config.TextColumn("Reason", width="large"),
+        },
+        disabled=["Item", "Category", "Qty", "Reason"],
+        hide_index=True,
+        use_container_width=True,
+        key=f"suggestions_table_{plan_id}_{editor_version}"
+    )
+
+    selected = [suggestions[i] for i in edited.index[edited["Add"]]]
+    if st.button("➕ Add selected to inventory", disabled=not selected):
+        items = [
+            (item.get('item'), item.get('suggested_quantity', 1), item.get('unit', 'unit'), item.get('category', 'Other'))
+            for item in selected
+        ]
+        if add_inventory_items(conn, user_id, items):
+            st.toast(f"Added {len(items)} item(s) to inventory!")
+            st.session_state.suggestions_editor_version = editor_version + 1
+            st.rerun()